@@ -1,25 +1,199 @@
 import streamlit as st
-from web_functions import predict
+from web_functions import FEATURE_COLUMNS, predict, load_model
+from data_browser import OPERATORS
+from datetime import datetime, timezone
+import db
 import pandas as pd
-from fpdf import FPDF
-from datetime import datetime
 import io
 import os
+import tempfile
 import csv
 from dotenv import load_dotenv
-import google.generativeai as genai
+import llm
+import report
+from cohort import COLUMN_ALIASES, read_cohort, score_cohort, recommend_all
+from bulk_reports import cohort_report_jobs, write_reports_zip
 
 load_dotenv()
 
-# Load API Key from Streamlit secrets
-GEMINI_API_KEY = st.secrets["gemini"]["api_key"]
-
-if not GEMINI_API_KEY:
-    raise ValueError("Gemini API key is missing! Add it to Streamlit secrets.")
-
-genai.configure(api_key=GEMINI_API_KEY)
+# Data main.py resolves for this page and passes to app() as keyword arguments
+DEPENDENCIES = ("profile", "browser")
+
+# Parallel Gemini calls for a cohort; the LLM gateway still caps the process total
+COHORT_WORKERS = 4
+
+# Worker processes rendering a cohort's PDF reports
+REPORT_WORKERS = 4
+
+def record_prediction(features, label):
+    """Add a prediction to the user's history shown on the Result page."""
+    try:
+        db.predictions().insert({
+            "user": st.session_state.get("username"),
+            "timestamp": datetime.now(timezone.utc),
+            "features": features,
+            "label": int(label),
+            "model_version": load_model()["version"],
+        })
+    except Exception as e:
+        # Losing a history point shouldn't hide the prediction itself
+        print(f"Could not store prediction: {e}")
+
+def medication_prompt(disease_type, patient_data):
+    return f"""
+                You are a medical expert. Based on the following disease diagnosis, suggest the appropriate medications, their dosage, and additional lifestyle recommendations:
+                
+                **Disease Type**: {disease_type}
+                
+                **Patient Data**:
+                {patient_data}
+                
+                Provide a clear and structured recommendation including:
+                - Medication name
+                - Recommended dosage
+                - Special precautions
+                - Any additional lifestyle suggestions
+                """
 
-def app(df, X, y):
+def cohort_section():
+    """Score a whole clinic's CSV (one row per patient) and offer the results as a file."""
+    st.subheader("Cohort Upload")
+    st.write("Upload a CSV with one row per patient and the parameters as column headers.")
+    cohort_file = st.file_uploader("Upload cohort CSV", type=["csv"], key="cohort_file")
+    if cohort_file is None:
+        return
+
+    try:
+        results = score_cohort(read_cohort(cohort_file))
+    except Exception as e:
+        st.error(f"Error reading the cohort file: {str(e)}")
+        return
+
+    st.write(f"Scored {len(results)} patients:")
+    st.dataframe(results['Disease Type'].value_counts())
+
+    # Keep fetched recommendations across reruns for this file
+    cache_key = f"cohort_recommendations_{cohort_file.file_id}"
+    with_condition = results[~results['Disease Type'].isin(["No diabetes detected", "Incomplete data"])]
+    if len(with_condition) and st.button(f"Get Gemini recommendations for {len(with_condition)} patients"):
+        progress = st.progress(0.0, text="Fetching recommendations...")
+        # Only the model features go to Gemini; names and IDs stay in the results file
+        patients = [
+            (index, row['Disease Type'], row[FEATURE_COLUMNS].to_dict())
+            for index, row in with_condition.iterrows()
+        ]
+        st.session_state[cache_key] = recommend_all(
+            patients,
+            lambda disease, data: llm.generate(medication_prompt(disease, data)),
+            max_workers=COHORT_WORKERS,
+            on_progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} patients"),
+        )
+
+    recommendations = st.session_state.get(cache_key)
+    if recommendations:
+        results['Medication Recommendation'] = pd.Series(recommendations)
+
+    st.download_button(
+        label="Download Cohort Results",
+        data=results.to_csv(index=False),
+        file_name="cohort_results.csv",
+        mime="text/csv",
+    )
+
+    # One PDF per patient, rendered in worker processes straight into a zip
+    # on disk; the session only keeps the path of its latest archive
+    if st.button(f"Build PDF reports for {len(results)} patients"):
+        progress = st.progress(0.0, text="Rendering reports...")
+        # Clicking Cancel reruns the page, which interrupts the job below;
+        # reports that haven't started yet are dropped
+        st.button("Cancel", key="cancel_cohort_reports")
+        fd, path = tempfile.mkstemp(prefix="cohort_reports_", suffix=".zip")
+        try:
+            with os.fdopen(fd, "wb") as archive:
+                summary = write_reports_zip(
+                    cohort_report_jobs(results),
+                    archive,
+                    max_workers=REPORT_WORKERS,
+                    on_progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} reports"),
+                )
+        except BaseException:
+            # Includes the rerun that cancels the job
+            os.remove(path)
+            raise
+        discard_cohort_reports()
+        st.session_state["cohort_reports"] = (cohort_file.file_id, path, summary)
+    elif st.session_state.get("cancel_cohort_reports"):
+        st.info("Report generation cancelled.")
+
+    reports = st.session_state.get("cohort_reports")
+    if reports and reports[0] == cohort_file.file_id:
+        _, path, summary = reports
+        if summary["failed"]:
+            st.warning(f"{len(summary['failed'])} reports could not be generated; see errors.txt in the archive.")
+        st.download_button(
+            label="Download PDF Reports (zip)",
+            # Read from disk only when the button is clicked
+            data=lambda: read_file(path),
+            file_name="cohort_reports.zip",
+            mime="application/zip",
+        )
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def discard_cohort_reports():
+    """Delete the session's previous report archive, if any."""
+    reports = st.session_state.pop("cohort_reports", None)
+    if reports is None:
+        return
+    try:
+        os.remove(reports[1])
+    except FileNotFoundError:
+        pass
+
+def data_browser_section(profile, browser):
+    """Page through the dataset; filtering and sorting happen server-side, only the page is sent."""
+    columns = st.multiselect("Columns", profile.columns, default=profile.columns, key="browse_columns")
+    sort_col, order_col, size_col = st.columns(3)
+    sort_by = sort_col.selectbox("Sort by", ["(none)", *profile.columns], key="browse_sort")
+    descending = order_col.checkbox("Descending", key="browse_descending")
+    page_size = size_col.selectbox("Rows per page", [25, 50, 100, 500], index=1, key="browse_page_size")
+
+    # Filters are kept as (column, operator, value) and ANDed together
+    filters = st.session_state.setdefault("browse_filters", [])
+    filter_col, op_col, value_col, add_col = st.columns([3, 1, 2, 1])
+    filter_column = filter_col.selectbox("Filter column", profile.columns, key="browse_filter_column")
+    filter_op = op_col.selectbox("Operator", list(OPERATORS), key="browse_filter_op")
+    filter_value = value_col.number_input("Value", value=float(profile.min.get(filter_column, 0.0)), key="browse_filter_value")
+    if add_col.button("Add filter", key="browse_add_filter"):
+        filters.append((filter_column, filter_op, filter_value))
+    if filters:
+        st.caption("Filters: " + " and ".join(f"{col} {op} {value:g}" for col, op, value in filters))
+        if st.button("Clear filters", key="browse_clear_filters"):
+            filters.clear()
+
+    query = {
+        "columns": columns,
+        "filters": filters,
+        "sort_by": None if sort_by == "(none)" else sort_by,
+        "descending": descending,
+        "page_size": page_size,
+    }
+    page = st.session_state.get("browse_page", 1)
+    window, total = browser.query(page=page - 1, **query)
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        # Filters or page size changed and the old page no longer exists
+        page = st.session_state["browse_page"] = pages
+        window, total = browser.query(page=page - 1, **query)
+
+    st.dataframe(window)
+    first = (page - 1) * page_size
+    st.caption(f"Rows {first + 1 if total else 0}-{first + len(window)} of {total} matching ({profile.rows} in total)")
+    st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="browse_page")
+
+def app(profile, browser):
     """This function creates the Streamlit app with tabs."""
     st.markdown("""
     <style>
@@ -41,18 +215,22 @@ def app(df, X, y):
 
         # Take input of features from the user
         st.subheader("Select Values:")
-        hba1c = st.slider("HbA1c Level", float(df["HbA1c_level"].min()), float(df["HbA1c_level"].max()))
-        glucose = st.slider("Glucose", int(df["Glucose"].min()), int(df["Glucose"].max()))
-        bp = st.slider("BloodPressure", int(df["BloodPressure"].min()), int(df["BloodPressure"].max()))
-        skinthickness = st.slider("SkinThickness", int(df["SkinThickness"].min()), int(df["SkinThickness"].max()))
-        insulin = st.slider("Insulin", int(df["Insulin"].min()), int(df["Insulin"].max()))
-        bmi = st.slider("BMI", float(df["BMI"].min()), float(df["BMI"].max()))
-        pedigree = st.slider("Genetic Correlation", float(df["DiabetesPedigreeFunction"].min()), float(df["DiabetesPedigreeFunction"].max()))
-        age = st.slider("Age", int(df["Age"].min()), int(df["Age"].max()))
-        preg = st.slider("Pregnancies", int(df["Pregnancies"].min()), int(df["Pregnancies"].max()))
-
-        # Create a list to store all the features
-        features = [hba1c, glucose, bp, skinthickness, insulin, bmi, pedigree, preg, age]
+        hba1c = st.slider("HbA1c Level", float(profile.min["HbA1c_level"]), float(profile.max["HbA1c_level"]))
+        glucose = st.slider("Glucose", int(profile.min["Glucose"]), int(profile.max["Glucose"]))
+        bp = st.slider("BloodPressure", int(profile.min["BloodPressure"]), int(profile.max["BloodPressure"]))
+        skinthickness = st.slider("SkinThickness", int(profile.min["SkinThickness"]), int(profile.max["SkinThickness"]))
+        insulin = st.slider("Insulin", int(profile.min["Insulin"]), int(profile.max["Insulin"]))
+        bmi = st.slider("BMI", float(profile.min["BMI"]), float(profile.max["BMI"]))
+        pedigree = st.slider("Genetic Correlation", float(profile.min["DiabetesPedigreeFunction"]), float(profile.max["DiabetesPedigreeFunction"]))
+        age = st.slider("Age", int(profile.min["Age"]), int(profile.max["Age"]))
+        preg = st.slider("Pregnancies", int(profile.min["Pregnancies"]), int(profile.max["Pregnancies"]))
+
+        # The patient keyed by training feature name: what the model scores and what history stores
+        patient = {
+            "HbA1c_level": hba1c, "Pregnancies": preg, "Glucose": glucose, "BloodPressure": bp,
+            "SkinThickness": skinthickness, "Insulin": insulin, "BMI": bmi,
+            "DiabetesPedigreeFunction": pedigree, "Age": age,
+        }
 
         # Create a DataFrame to store slider values
         slider_values = {
@@ -64,8 +242,9 @@ def app(df, X, y):
         # Create a button to predict
         if st.button("Predict"):
             # Get prediction and model score
-            prediction, score = predict(X, y, features)
+            prediction, score = predict(patient)
             score = score + 0.18  # Correction factor
+            record_prediction(patient, prediction[0])
            
             # Store prediction result
             prediction_result = ""
@@ -111,127 +290,27 @@ def app(df, X, y):
 
             # PDF Download Button
             with col1:
-                try:
-                    # Generate PDF
-                    pdf = FPDF()
-                    pdf.add_page()
-                    
-                    # Add title
-                    pdf.set_font("Arial", 'B', 16)
-                    pdf.cell(200, 10, txt="Diabetes Risk Assessment Report", ln=True, align='C')
-                    pdf.ln(10)
-
-                    # Add user name and timestamp
-                    pdf.set_font("Arial", size=12)
-                    pdf.cell(200, 10, txt=f"User Name: {user_name}", ln=True)
-                    pdf.cell(200, 10, txt=f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-                    pdf.ln(10)
-
-                    # Add prediction result if available
-                    if 'prediction_result' in st.session_state:
-                        pdf.set_font("Arial", 'B', 12)
-                        pdf.cell(200, 10, txt="Prediction Result:", ln=True)
-                        pdf.set_font("Arial", size=12)
-                        pdf.cell(200, 10, txt=st.session_state.get('prediction_result', ''), ln=True)
-                        pdf.ln(5)
-
-                    # Add model accuracy if available
-                    if 'model_accuracy' in st.session_state:
-                        pdf.set_font("Arial", 'B', 12)
-                        pdf.cell(200, 10, txt="Model Accuracy:", ln=True)
-                        pdf.set_font("Arial", size=12)
-                        pdf.cell(200, 10, txt=st.session_state.get('model_accuracy', ''), ln=True)
-                        pdf.ln(10)
-
-                    # Add the measurements table
-                    pdf.set_font("Arial", 'B', 12)
-                    pdf.cell(200, 10, txt="Measurements:", ln=True)
-                    pdf.set_font("Arial", size=12)
-                    
-                    # Create the data table
-                    for index, row in slider_df.iterrows():
-                        pdf.cell(100, 10, txt=f"{row['Feature']}:", ln=False)
-                        pdf.cell(100, 10, txt=f"{str(row['Value'])}", ln=True)
-
-                    # Create a temporary file path
-                    temp_file = f"temp_{user_name}_report.pdf"
-                    
-                    # Save PDF to a temporary file
-                    pdf.output(temp_file)
-                    
-                    # Read the temporary file and create download button
-                    with open(temp_file, 'rb') as file:
-                        pdf_data = file.read()
+                report_args = {
+                    "user_name": user_name,
+                    "measurements": list(zip(slider_values["Feature"], slider_values["Value"])),
+                    "prediction_result": st.session_state.get('prediction_result'),
+                    "model_accuracy": st.session_state.get('model_accuracy'),
+                }
+                # The PDF is only built on request; afterwards it comes from
+                # report.py's cache until the inputs or prediction change
+                if st.button("Generate PDF Report"):
+                    st.session_state['report_key'] = report.report_key(**report_args)
+
+                if st.session_state.get('report_key') == report.report_key(**report_args):
+                    try:
                         st.download_button(
                             label="Download PDF Report",
-                            data=pdf_data,
+                            data=report.build_report(**report_args),
                             file_name=f"{user_name}_diabetes_report.pdf",
                             mime="application/pdf",
                         )
-                    
-                    # Import os and remove the temporary file
-                    
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-
-                except Exception as e:
-                    pass
-                try:
-                    # Generate PDF
-                    pdf = FPDF()
-                    pdf.add_page()
-                    
-                    # Add title
-                    pdf.set_font("Arial", 'B', 16)
-                    pdf.cell(200, 10, txt="Diabetes Risk Assessment Report", ln=True, align='C')
-                    pdf.ln(10)
-
-                    # Add user name and timestamp
-                    pdf.set_font("Arial", size=12)
-                    pdf.cell(200, 10, txt=f"User Name: {user_name}", ln=True)
-                    pdf.cell(200, 10, txt=f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-                    pdf.ln(10)
-
-                    # Add prediction result if available
-                    if 'prediction_result' in st.session_state:
-                        pdf.set_font("Arial", 'B', 12)
-                        pdf.cell(200, 10, txt="Prediction Result:", ln=True)
-                        pdf.set_font("Arial", size=12)
-                        pdf.cell(200, 10, txt=st.session_state.get('prediction_result', ''), ln=True)
-                        pdf.ln(5)
-
-                    # Add model accuracy if available
-                    if 'model_accuracy' in st.session_state:
-                        pdf.set_font("Arial", 'B', 12)
-                        pdf.cell(200, 10, txt="Model Accuracy:", ln=True)
-                        pdf.set_font("Arial", size=12)
-                        pdf.cell(200, 10, txt=st.session_state.get('model_accuracy', ''), ln=True)
-                        pdf.ln(10)
-
-                    # Add the measurements table
-                    pdf.set_font("Arial", 'B', 12)
-                    pdf.cell(200, 10, txt="Measurements:", ln=True)
-                    pdf.set_font("Arial", size=12)
-                    
-                    # Create the data table
-                    for index, row in slider_df.iterrows():
-                        pdf.cell(100, 10, txt=f"{row['Feature']}:", ln=False)
-                        pdf.cell(100, 10, txt=f"{str(row['Value'])}", ln=True)
-
-                    # Save to bytes
-                    pdf_output = io.BytesIO()
-                    pdf.output(pdf_output)
-                    pdf_bytes = pdf_output.getvalue()
-                    
-                    # Create download button
-                    st.download_button(
-                        label="Download PDF Report",
-                        data=pdf_bytes,
-                        file_name=f"{user_name}_diabetes_report.pdf",
-                        mime="application/pdf",
-                    )
-                except Exception as e:
-                    st.success("Your report is generated")
+                    except Exception as e:
+                        st.error(f"Error generating PDF: {str(e)}")
 
             # CSV Download Button
             with col2:
@@ -256,25 +335,12 @@ def app(df, X, y):
     with tab2:
         
             def get_gemini_medication_recommendation(disease_type, patient_data):
-                prompt = f"""
-                You are a medical expert. Based on the following disease diagnosis, suggest the appropriate medications, their dosage, and additional lifestyle recommendations:
-                
-                **Disease Type**: {disease_type}
+                # Stream the answer onto the page as it is generated
+                answer = llm.stream(medication_prompt(disease_type, patient_data))
+                st.write_stream(answer)
+                st.caption(f"First token after {answer.ttft:.2f}s, full answer in {answer.total:.2f}s")
                 
-                **Patient Data**:
-                {patient_data}
-                
-                Provide a clear and structured recommendation including:
-                - Medication name
-                - Recommended dosage
-                - Special precautions
-                - Any additional lifestyle suggestions
-                """
-                
-                model = genai.GenerativeModel("gemini-2.0-flash")  # Using Gemini Pro for text-based generation
-                response = model.generate_content(prompt)
-                
-                return response.text
+                return answer.text
 
             # Streamlit UI
             st.title("Medication Recommendations")
@@ -331,21 +397,11 @@ def app(df, X, y):
                         
                         df_processed['Pregnancies'] = df_processed['Pregnancies'].fillna(0).astype(int)
 
-                        # Extract features for prediction
-                        features = [
-                            float(df_processed.iloc[0]['HbA1c Level']),
-                            float(df_processed.iloc[0]['Glucose']),
-                            float(df_processed.iloc[0]['BloodPressure']),
-                            float(df_processed.iloc[0]['SkinThickness']),
-                            float(df_processed.iloc[0]['Insulin']),
-                            float(df_processed.iloc[0]['BMI']),
-                            float(df_processed.iloc[0]['Genetic Correlation']),
-                            int(df_processed.iloc[0]['Pregnancies']),
-                            float(df_processed.iloc[0]['Age'])
-                        ]
+                        # Extract features for prediction, keyed by training feature name
+                        patient = {COLUMN_ALIASES[col]: float(df_processed.iloc[0][col]) for col in required_columns}
 
                         # Make prediction
-                        prediction, confidence = predict(X, y, features)
+                        prediction, confidence = predict(patient)
 
                         # Disease mapping
                         disease_type = ""
@@ -369,10 +425,11 @@ def app(df, X, y):
                             patient_data = df_processed.iloc[0].to_dict()
                             
                             # Call Gemini to generate medication recommendations
-                            medication_info = get_gemini_medication_recommendation(disease_type, patient_data)
-
                             st.info("Gemini AI Recommended Medication:")
-                            st.write(medication_info)
+                            try:
+                                medication_info = get_gemini_medication_recommendation(disease_type, patient_data)
+                            except llm.LLMUnavailableError as e:
+                                st.error(str(e))
                         else:
                             st.success("No diabetes detected")
                             st.info("Maintain a healthy lifestyle.")
@@ -386,6 +443,8 @@ def app(df, X, y):
                 except Exception as e:
                     st.error(f"Error reading the file: {str(e)}")
 
+            cohort_section()
+
 
                     
 
@@ -397,7 +456,7 @@ def app(df, X, y):
 
         # Create an expansion option to check the data
         with st.expander("View data"):
-            st.dataframe(df)
+            data_browser_section(profile, browser)
 
         # Create a section for columns description
         st.subheader("Columns Description:")
@@ -408,18 +467,21 @@ def app(df, X, y):
         # Show name of all columns
         with col_name:
             if st.checkbox("Column Names"):
-                st.dataframe(df.columns)
+                st.dataframe(profile.columns)
 
         # Show datatype of all columns
         with summary:
             if st.checkbox("View Summary"):
-                st.dataframe(df.describe())
+                st.dataframe(profile.describe)
 
         # Show data for each column
         with col_data:
             if st.checkbox("Columns Data"):
-                col = st.selectbox("Column Name", list(df.columns))
-                st.dataframe(df[col])
+                col = st.selectbox("Column Name", profile.columns)
+                # Precomputed statistics instead of shipping the whole column
+                st.dataframe(profile.describe[[col]])
+                if col in profile.quantiles.columns:
+                    st.dataframe(profile.quantiles[[col]].rename_axis("quantile"))
 
         # Add the link to the dataset
         st.link_button("View Data Set", "https://www.kaggle.com/uciml/pima-indians-diabetes-database")
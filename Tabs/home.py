@@ -1,5 +1,4 @@
 import streamlit as st
-import PIL
 
 def app():
     st.title('Integrated Diabetes Health Care Program')
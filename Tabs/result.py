@@ -1,58 +1,73 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from datetime import datetime, timedelta, timezone
+import charts
+import db
+
+# Model labels as shown on the dashboard
+CLASS_NAMES = {
+    0: "No diabetes",
+    1: "Type 1",
+    2: "Type 2",
+    3: "Gestational",
+    4: "Prediabetes",
+    5: "Monogenic / Type 3c",
+}
+
+PERIODS = {
+    "Last 30 days": timedelta(days=30),
+    "Last year": timedelta(days=365),
+    "All time": None,
+}
+
+# Buckets per trend chart; the server averages readings down to this many points
+MAX_POINTS = 60
+
+HEALTHY_INSULIN = 15
 
 # Function to visualize health metrics
 def app():
     st.title("📊 Patient Health Metrics Dashboard")
 
-    # Set global style for neon-like effect
-    plt.style.use("dark_background")
-
-    # Simulated glucose level data (With & Without Medication)
-    days = np.arange(1, 31)
-    glucose_no_med = np.random.normal(loc=180, scale=20, size=len(days))
-    glucose_with_med = glucose_no_med - np.random.normal(loc=40, scale=10, size=len(days))
-    
-    # Line chart: Glucose trend with & without medication
-    fig, ax = plt.subplots()
-    ax.set_facecolor("black")
-    ax.plot(days, glucose_no_med, marker='o', linestyle='-', label='Without Medication', color='#FF00FF')  # Neon pink
-    ax.plot(days, glucose_with_med, marker='s', linestyle='--', label='With Medication', color='#00FFFF')  # Neon cyan
-    ax.set_title("Glucose Level Trend", color='white')
-    ax.set_xlabel("Days", color='white')
-    ax.set_ylabel("Glucose Level (mg/dL)", color='white')
-    ax.legend()
-    st.pyplot(fig)
-
-    # Simulated Insulin level comparison (Patient vs Healthy)
-    patient_insulin = np.random.normal(loc=12, scale=2, size=1)[0]
-    healthy_insulin = 15
-    
-    # Bar chart: Insulin level comparison
-    fig, ax = plt.subplots()
-    ax.set_facecolor("black")
-    ax.bar(["Patient"], [patient_insulin], color='#00FF00', label='Patient')  # Neon green
-    ax.bar(["Healthy"], [healthy_insulin], color='#FF4500', label='Healthy')  # Neon orange-red
-    ax.set_title("Insulin Levels Comparison", color='white')
-    ax.set_ylabel("Insulin Level (μU/mL)", color='white')
-    ax.legend()
-    st.pyplot(fig)
-    
-    # Simulated Diabetes Class Distribution
-    diabetes_classes = ["Class 1", "Class 2", "Class 3", "Class 4", "Class 5"]
-    diabetes_distribution = np.random.randint(10, 50, size=len(diabetes_classes))
-    
-    # Pie chart: Diabetes class distribution
-    fig, ax = plt.subplots()
-    ax.set_facecolor("black")
-    colors = ['#FF00FF', '#00FFFF', '#00FF00', '#FFFF00', '#FF4500']  # Neon colors
-    ax.pie(diabetes_distribution, labels=diabetes_classes, autopct='%1.1f%%', startangle=140, colors=colors, textprops={'color': "blue"})
-    ax.set_title("Diabetes Classification Distribution", color='white')
-    st.pyplot(fig)
+    username = st.session_state.get("username")
+    period = st.selectbox("Period", list(PERIODS), key="result_period")
+    since = datetime.now(timezone.utc) - PERIODS[period] if PERIODS[period] else None
+
+    try:
+        predictions = db.predictions()
+        latest = predictions.latest(username)
+        if latest is None:
+            st.info("No predictions yet. Run one on the Diagnosis page to start your history.")
+            return
+        glucose = predictions.feature_series(username, "Glucose", since=since, max_points=MAX_POINTS)
+        counts = predictions.label_counts(username, since=since)
+    except Exception as e:
+        st.error(f"Error loading your prediction history: {e}")
+        return
+
+    # Line chart: Glucose trend across your predictions
+    if glucose:
+        st.image(charts.feature_trend(
+            np.array([bucket["_id"] for bucket in glucose], dtype="datetime64[s]"),
+            [bucket["avg"] for bucket in glucose],
+            [bucket["min"] for bucket in glucose],
+            [bucket["max"] for bucket in glucose],
+            "Glucose Level Trend",
+            "Glucose Level (mg/dL)",
+        ))
+    else:
+        st.info(f"No predictions in the selected period ({period.lower()}).")
+
+    # Bar chart: Insulin level of the latest prediction vs a healthy level
+    st.image(charts.insulin_comparison(latest["features"]["Insulin"], HEALTHY_INSULIN))
+
+    # Pie chart: Diabetes class distribution of your predictions
+    if counts:
+        st.image(charts.class_distribution(
+            [CLASS_NAMES.get(label, f"Class {label}") for label in counts],
+            list(counts.values()),
+        ))
 
 # Run the dashboard
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
@@ -1,19 +1,35 @@
-import streamlit as st
-import google.generativeai as genai
-from utils import store_user_query  # import your utils here
-
-GEMINI_API_KEY = st.secrets["gemini"]["api_key"]
-
-
-if not GEMINI_API_KEY:
-    st.error("API key is missing! Add it to Streamlit secrets.")
-    st.stop()
-
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+import threading
 
-def ask_gemini(query):
-    prompt = f"""
+import streamlit as st
+import llm
+from utils import store_user_query, get_user_queries_page  # import your utils here
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+
+HISTORY_PAGE_SIZE = 10
+
+# Bump whenever the prompt below changes so cached answers for the old prompt are ignored
+PROMPT_VERSION = 1
+
+response_cache = ResponseCache()
+
+# In-memory only, so it never outlives the PROMPT_VERSION it was filled with.
+# Built on the first question, since it loads scipy and sklearn.
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache():
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    threshold=float(st.secrets.get("capsule", {}).get("semantic_threshold", 0.8))
+                )
+    return _semantic_cache
+
+def build_prompt(query):
+    return f"""
 You are a medical chatbot specialized in diabetes and its health implications. 
 Answer only diabetes-related queries with medically accurate information. 
 If a question is unrelated to diabetes, politely inform the user that you can only answer diabetes-related questions.
@@ -22,15 +38,71 @@ If a question is unrelated to diabetes, politely inform the user that you can on
 
 Provide a clear, concise, and accurate medical response.
 """
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(prompt)
-    return response.text
+
+def cached_answer(query):
+    # Exact (normalized) match first, then paraphrases of earlier questions
+    answer = response_cache.lookup(query, PROMPT_VERSION)
+    if answer is None:
+        answer, _ = get_semantic_cache().lookup(query)
+    return answer
+
+def remember_answer(query, answer, elapsed):
+    response_cache.store(query, PROMPT_VERSION, answer, elapsed)
+    get_semantic_cache().add(query, answer)
+
+def stream_answer(query):
+    """Render the answer as it streams in and return the full text."""
+    cached = cached_answer(query)
+    if cached is not None:
+        return cached
+
+    placeholder = st.empty()
+    answer = llm.stream(build_prompt(query))
+    with placeholder.container():
+        st.markdown("**🤖 Chatbot:**")
+        st.write_stream(answer)
+    # The finished answer is shown again in the chat history below
+    placeholder.empty()
+    # An empty answer means the stream broke off; don't serve it again
+    if answer.text.strip():
+        remember_answer(query, answer.text, answer.total)
+    st.caption(f"First token after {answer.ttft:.2f}s, full answer in {answer.total:.2f}s")
+    return answer.text
+
+def past_questions(username):
+    st.subheader("My past questions")
+    if not st.checkbox("Show my past questions", key="show_past_questions"):
+        return
+
+    # Stack of page cursors; the last one is the page being shown
+    cursors = st.session_state.setdefault("past_questions_cursors", [None])
+    queries, next_cursor = get_user_queries_page(username, cursors[-1], HISTORY_PAGE_SIZE)
+
+    if not queries:
+        st.info("You haven't asked any questions yet.")
+        return
+    for timestamp, query in queries:
+        st.markdown(f"**{timestamp.strftime('%Y-%m-%d %H:%M')}** — {query}")
+
+    newer, older = st.columns(2)
+    if newer.button("⬅️ Newer", key="past_questions_newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if older.button("Older ➡️", key="past_questions_older", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
 
 def app():
     st.title("🩺 Diabetes Medical Chatbot")
     st.image('./images/capsule.png')
     st.success("Please ask your queries related to diabetes and its health implications.")
 
+    try:
+        llm.get_backend()
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+
     # Initialize chat history
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
@@ -43,10 +115,12 @@ def app():
             # Store user query securely in DB (encrypted)
             store_user_query(username, user_query)
 
-        response = ask_gemini(user_query)
-
-        st.session_state.chat_history.append(("You", user_query))
-        st.session_state.chat_history.append(("Chatbot", response))
+        try:
+            response = stream_answer(user_query)
+            st.session_state.chat_history.append(("You", user_query))
+            st.session_state.chat_history.append(("Chatbot", response))
+        except llm.LLMUnavailableError as e:
+            st.error(str(e))
 
     if st.session_state.chat_history:
         st.subheader("Chat History:")
@@ -54,6 +128,18 @@ def app():
             icon = "🧑‍⚕️" if role == "You" else "🤖"
             st.markdown(f"**{icon} {role}:** {message}")
 
+    username = st.session_state.get("username")
+    if username:
+        past_questions(username)
+
+    if st.secrets.get("capsule", {}).get("show_cache_stats", False):
+        with st.sidebar.expander("Capsule cache"):
+            st.json({
+                "exact": response_cache.stats(),
+                "semantic": _semantic_cache.stats() if _semantic_cache is not None else None,
+                "streaming": llm.stream_timings.snapshot(),
+            })
+
 
 
 
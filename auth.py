@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import jwt
+import streamlit as st
+
+import db
+
+# Bounded cache of recently used credential records so a login rerun
+# doesn't have to go back to MongoDB for the same user every time
+CREDENTIAL_CACHE_SIZE = 1024
+CREDENTIAL_CACHE_TTL = 300  # seconds
+
+# Remember-me cookie: a JWT of {"username", "exp_date", "pwd"} signed with the
+# [auth] cookie_key secret. "pwd" fingerprints the stored password hash, so a
+# password change (or a rehash at a new cost) revokes existing cookies.
+COOKIE_NAME = "diabetes_app"
+COOKIE_EXPIRY_DAYS = 30
+
+
+class CredentialCache:
+    """Thread-safe LRU cache of {username: {"name", "password"}} records."""
+
+    def __init__(self, maxsize=CREDENTIAL_CACHE_SIZE, ttl=CREDENTIAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username):
+        with self._lock:
+            entry = self._records.get(username)
+            if entry is None:
+                return None
+            stored_at, record = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._records[username]
+                return None
+            self._records.move_to_end(username)
+            return record
+
+    def put(self, username, record):
+        with self._lock:
+            self._records[username] = (time.monotonic(), record)
+            self._records.move_to_end(username)
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._records.clear()
+            else:
+                self._records.pop(username, None)
+
+
+credential_cache = CredentialCache()
+
+
+def get_user_credentials(username):
+    """Return {"name", "password"} for a single username, or None if it doesn't exist."""
+    username = username.lower()
+    record = credential_cache.get(username)
+    if record is not None:
+        return record
+
+    user_doc = db.users().find_by_username(username)
+    if user_doc is None:
+        return None
+
+    record = {"name": user_doc["name"], "password": user_doc["hashed_password"]}
+    credential_cache.put(username, record)
+    return record
+
+
+def invalidate_user(username=None):
+    credential_cache.invalidate(username.lower() if username else None)
+
+
+def cookie_key():
+    """Signing key for the remember-me cookie, or None if it isn't configured."""
+    try:
+        return st.secrets.get("auth", {}).get("cookie_key") or None
+    except FileNotFoundError:
+        return None
+
+
+def _password_fingerprint(hashed_password):
+    return hashlib.sha256(hashed_password.encode()).hexdigest()[:32]
+
+
+def make_cookie_token(username, record, key, expiry_days=COOKIE_EXPIRY_DAYS):
+    return jwt.encode({
+        "username": username,
+        "exp_date": time.time() + expiry_days * 86_400,
+        "pwd": _password_fingerprint(record["password"]),
+    }, key, algorithm="HS256")
+
+
+def verify_cookie_token(token, key):
+    """(username, credentials) for a valid, unexpired token whose password fingerprint
+    still matches the stored hash, else None."""
+    try:
+        claims = jwt.decode(token, key, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        return None
+    username = claims.get("username")
+    if not username or not claims.get("pwd") or claims.get("exp_date", 0) <= time.time():
+        return None
+    record = get_user_credentials(username)
+    if record is None or claims["pwd"] != _password_fingerprint(record["password"]):
+        return None
+    return username, record
+
+
+def restore_session():
+    """Log the session in from the remember-me cookie.
+
+    The cookie is verified once per session; afterwards (and for sessions that
+    logged in with the form) the identity in session state is trusted, so
+    reruns don't decode cookies or load credentials. Without a configured
+    cookie_key no session is ever restored.
+    """
+    if st.session_state.get("cookie_checked"):
+        return
+    st.session_state["cookie_checked"] = True
+    if st.session_state.get("logged_in"):
+        return
+
+    key = cookie_key()
+    token = st.context.cookies.get(COOKIE_NAME)
+    verified = verify_cookie_token(token, key) if key and token else None
+    if verified is None:
+        return
+    username, record = verified
+    st.session_state["username"] = username
+    st.session_state["name"] = record["name"]
+    st.session_state["logged_in"] = True
+
+
+def remember_session(username, record):
+    """Set the remember-me cookie for a user who just logged in with the form.
+
+    `record` must hold the user's current password hash. Does nothing when no
+    cookie_key is configured.
+    """
+    key = cookie_key()
+    if key is None:
+        return
+    import extra_streamlit_components as stx
+
+    stx.CookieManager().set(COOKIE_NAME, make_cookie_token(username, record, key),
+                            expires_at=datetime.now() + timedelta(days=COOKIE_EXPIRY_DAYS))
+    st.session_state["cookie_set"] = True
+
+
+def end_session():
+    """Delete the remember-me cookie and forget the session's identity."""
+    if COOKIE_NAME in st.context.cookies or st.session_state.pop("cookie_set", False):
+        import extra_streamlit_components as stx
+
+        cookie_manager = stx.CookieManager()
+        # The component reports no cookies on its first render, and delete() expects a known one
+        cookie_manager.cookies.setdefault(COOKIE_NAME, None)
+        cookie_manager.delete(COOKIE_NAME)
+    st.session_state["logged_in"] = False
+    st.session_state["username"] = None
+    st.session_state["name"] = None
@@ -0,0 +1,271 @@
+"""In-process stand-ins so the app can be benchmarked without a network.
+
+FakeMongoClient implements the part of pymongo's API that db.py uses (finds
+with simple filters, sorts and limits, inserts, $set updates, index creation and the
+$match/$group/$sort aggregations of PredictionsRepository), on plain lists.
+Install it with db.set_client(FakeMongoClient()); for the LLM use
+llm.set_backend(llm.StubBackend()).
+"""
+import copy
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+# MongoDB's reference point for $dateTrunc binSize
+_DATE_TRUNC_EPOCH = datetime(2000, 1, 1)
+_FIXED_UNITS = {
+    "millisecond": timedelta(milliseconds=1),
+    "second": timedelta(seconds=1),
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+_MONTH_UNITS = {"month": 1, "quarter": 3, "year": 12}
+
+
+def _naive_utc(value):
+    # BSON dates have no zone: the server stores UTC and pymongo hands back naive datetimes
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    if isinstance(value, dict):
+        return {key: _naive_utc(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_naive_utc(item) for item in value]
+    return value
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _compare(value, condition):
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        return value == _naive_utc(condition)
+    for op, operand in _naive_utc(condition).items():
+        if op == "$in":
+            ok = value in operand
+        elif op == "$ne":
+            ok = value != operand
+        elif value is None:
+            ok = False
+        elif op == "$gt":
+            ok = value > operand
+        elif op == "$gte":
+            ok = value >= operand
+        elif op == "$lt":
+            ok = value < operand
+        elif op == "$lte":
+            ok = value <= operand
+        else:
+            raise NotImplementedError(f"FakeMongoClient does not support {op}")
+        if not ok:
+            return False
+    return True
+
+
+def _matches(doc, query):
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(_matches(doc, sub) for sub in condition):
+                return False
+        elif not _compare(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {key for key, flag in projection.items() if flag and key != "_id"}
+    if include:
+        result = {key: copy.deepcopy(doc[key]) for key in include if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {key: copy.deepcopy(value) for key, value in doc.items() if projection.get(key, 1)}
+
+
+def _sort(docs, keys):
+    # Stable sorts from the least to the most significant key
+    for field, direction in reversed(keys):
+        docs.sort(key=lambda doc: (_get(doc, field) is not None, _get(doc, field)), reverse=direction < 0)
+    return docs
+
+
+def _date_trunc(date, unit, bin_size=1):
+    if unit in _MONTH_UNITS:
+        step = _MONTH_UNITS[unit] * bin_size
+        months = (date.year - 2000) * 12 + date.month - 1
+        months -= months % step
+        return datetime(2000 + months // 12, months % 12 + 1, 1)
+    step = _FIXED_UNITS[unit] * bin_size
+    # Weeks start on Sunday, and 2000-01-02 is the first Sunday after the epoch
+    epoch = _DATE_TRUNC_EPOCH + timedelta(days=1) if unit == "week" else _DATE_TRUNC_EPOCH
+    return epoch + ((date - epoch) // step) * step
+
+
+def _evaluate(doc, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _get(doc, expression[1:])
+    if isinstance(expression, dict) and "$dateTrunc" in expression:
+        spec = expression["$dateTrunc"]
+        date = _evaluate(doc, spec["date"])
+        return None if date is None else _date_trunc(date, spec["unit"], spec.get("binSize", 1))
+    return expression
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _evaluate(doc, spec["_id"])
+        groups.setdefault(key, []).append(doc)
+
+    results = []
+    for key, members in groups.items():
+        result = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expression), = accumulator.items()
+            values = [_evaluate(doc, expression) for doc in members]
+            numbers = [value for value in values if value is not None]
+            if op == "$sum":
+                result[field] = sum(numbers)
+            elif op == "$avg":
+                result[field] = sum(numbers) / len(numbers) if numbers else None
+            elif op == "$min":
+                result[field] = min(numbers) if numbers else None
+            elif op == "$max":
+                result[field] = max(numbers) if numbers else None
+            else:
+                raise NotImplementedError(f"FakeMongoClient does not support {op}")
+        results.append(result)
+    return results
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        keys = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction or 1)]
+        _sort(self._docs, keys)
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def __iter__(self):
+        docs = self._docs[:self._limit] if self._limit else self._docs
+        return iter(docs)
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.indexes = []
+        self._docs = []
+        self._lock = threading.Lock()
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+        return str(keys)
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        with self._lock:
+            self._docs.append(_naive_utc(copy.deepcopy(doc)))
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    def insert_many(self, docs, ordered=True):
+        ids = [self.insert_one(doc).inserted_id for doc in docs]
+        return SimpleNamespace(inserted_ids=ids)
+
+    def update_one(self, query, update):
+        with self._lock:
+            doc = next((doc for doc in self._docs if _matches(doc, query)), None)
+            if doc is not None:
+                for op, fields in update.items():
+                    if op != "$set":
+                        raise NotImplementedError(f"FakeMongoClient does not support {op}")
+                    doc.update(_naive_utc(copy.deepcopy(fields)))
+        return SimpleNamespace(matched_count=int(doc is not None), modified_count=int(doc is not None))
+
+    def _select(self, query):
+        with self._lock:
+            return [doc for doc in self._docs if _matches(doc, query)]
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([_project(doc, projection) for doc in self._select(query)])
+
+    def find_one(self, query=None, projection=None, sort=None):
+        docs = self._select(query)
+        if sort:
+            _sort(docs, sort)
+        return _project(docs[0], projection) if docs else None
+
+    def count_documents(self, query):
+        return len(self._select(query))
+
+    def aggregate(self, pipeline):
+        docs = self._select({})
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                docs = [doc for doc in docs if _matches(doc, spec)]
+            elif name == "$group":
+                docs = _group(docs, spec)
+            elif name == "$sort":
+                docs = _sort(docs, list(spec.items()))
+            elif name == "$limit":
+                docs = docs[:spec]
+            else:
+                raise NotImplementedError(f"FakeMongoClient does not support {name}")
+        return iter(docs)
+
+
+class FakeDatabase:
+    def __init__(self, name):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def list_collection_names(self):
+        with self._lock:
+            return list(self._collections)
+
+    def create_collection(self, name, **options):
+        # Options (time series, capped...) are accepted and ignored
+        return self[name]
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(name)
+        return self._databases[name]
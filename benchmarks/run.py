@@ -0,0 +1,291 @@
+"""Offline benchmarks for the app's hot paths.
+
+    python benchmarks/run.py [--sizes 1000,100000] [--large] [--repeat 5]
+                             [--out benchmarks/results/baseline.json]
+                             [--compare benchmarks/results/baseline.json]
+
+Everything runs in a scratch directory with generated secrets, a synthetic
+diabetes.csv per dataset size, an in-process MongoDB stand-in (fakes.py) and
+the stub LLM backend, so no network access or real credentials are needed.
+
+Timed, per dataset size: load_data from the CSV and the columnar copy (and a
+cache hit), train_model, predict for one patient, predict_batch over the whole
+dataset and a render of the Diagnosis page. Once: building a PDF report
+(rendered and cached), Fernet encrypt/decrypt of a chatbot query, and a render
+of every other page through main.py, with AppTest.
+
+Results are written as JSON; --compare prints each benchmark's median against
+an earlier file and exits 1 if any got slower than --threshold times.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = [1_000, 100_000]
+LARGE_SIZE = 10_000_000
+
+BENCH_USER = "bench"
+
+SAMPLE_QUERY = "What are the early symptoms of type 2 diabetes and how is HbA1c used to diagnose it?"
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "first_s": samples[0],
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+    }
+
+
+def prepare_workspace(path):
+    """Scratch app directory: generated secrets and the images the pages load."""
+    from cryptography.fernet import Fernet
+
+    os.makedirs(os.path.join(path, ".streamlit"), exist_ok=True)
+    with open(os.path.join(path, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(
+            '[mongodb]\nuri = "mongodb://bench.invalid:27017"\n\n'
+            f'[encryption]\nkey = "{Fernet.generate_key().decode()}"\n\n'
+            '[gemini]\napi_key = "offline"\n\n'
+            '[llm]\nbackend = "stub"\n'
+        )
+    images = os.path.join(path, "images")
+    if not os.path.exists(images):
+        shutil.copytree(os.path.join(REPO, "images"), images)
+
+
+def seed_database(days=730):
+    """A user to log in as and two years of daily predictions for the Result page."""
+    import bcrypt
+    import db
+
+    db.users().insert({
+        "name": "Bench User",
+        "username": BENCH_USER,
+        "hashed_password": bcrypt.hashpw(b"bench", bcrypt.gensalt(4)).decode(),
+        "created_at": datetime.now(timezone.utc),
+    })
+    predictions = db.predictions()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for day in range(days):
+        predictions.insert({
+            "user": BENCH_USER,
+            "timestamp": now - timedelta(days=day),
+            "features": {"Glucose": 90 + day % 110, "Insulin": 20 + day % 60},
+            "label": day % 6,
+            "model_version": "bench",
+        })
+
+
+def render_page(page):
+    """Render main.py for a logged-in user on `page` (or the Login page)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(REPO, "main.py"), default_timeout=600)
+    if page != "Login":
+        at.session_state["logged_in"] = True
+        at.session_state["username"] = BENCH_USER
+        at.session_state["name"] = "Bench User"
+        at.session_state["page"] = page
+        at.session_state["nav_main"] = page
+    at.run()
+    check_rendered(at, page)
+    return at
+
+
+def check_rendered(at, page):
+    # Pages report most failures with st.error; don't time an error page as a success
+    if at.exception:
+        raise RuntimeError(f"{page} page raised: {at.exception[0].message}")
+    if at.error:
+        raise RuntimeError(f"{page} page showed an error: {at.error[0].value}")
+
+
+def ask_capsule():
+    at = render_page("Ask Queries")
+    at.text_input[0].input(SAMPLE_QUERY)
+    next(button for button in at.button if button.label == "Get Answer").click()
+    at.run()
+    check_rendered(at, "Ask Queries")
+
+
+def clear_caches():
+    import web_functions
+
+    for loader in (web_functions.load_data, web_functions.load_profile,
+                   web_functions.load_model, web_functions.load_browser):
+        loader.clear()
+
+
+def bench_dataset(rows, repeat):
+    """Benchmarks that depend on the dataset, for a synthetic dataset of `rows` rows."""
+    import convert_data
+    import train
+    import web_functions
+    from synthetic import write_dataset
+
+    write_dataset(web_functions.DATA_PATH, rows)
+    convert_data.convert(web_functions.DATA_PATH, web_functions.COLUMNAR_DIR)
+    train.save_artifact(train.build_artifact(web_functions.DATA_PATH))
+    clear_caches()
+
+    # The 10M run is minutes per repeat for the slow paths
+    slow_repeat = repeat if rows <= 100_000 else 1
+    df, X, y = web_functions.read_dataset(web_functions.DATA_PATH)
+    one_patient = X.iloc[0].to_dict()
+
+    results = {
+        "load_data.csv": measure(lambda: web_functions.read_dataset(web_functions.DATA_PATH), slow_repeat),
+        "load_data.columnar": measure(lambda: web_functions.read_dataset(web_functions.COLUMNAR_DIR), repeat),
+        "train_model": measure(lambda: web_functions.train_model(X, y), slow_repeat),
+    }
+    web_functions.load_data()
+    results["load_data.cached"] = measure(web_functions.load_data, repeat)
+    web_functions.load_model()
+    results["predict"] = measure(lambda: web_functions.predict(one_patient), max(repeat, 100))
+    results["predict_batch"] = measure(lambda: web_functions.predict_batch(X), slow_repeat)
+    results["page.Diagnosis"] = measure(lambda: render_page("Diagnosis"), slow_repeat)
+    return results
+
+
+def bench_common(repeat):
+    """Benchmarks that don't depend on the dataset size."""
+    import report
+    import utils
+
+    measurements = [("HbA1c Level", 6.1), ("Glucose", 148), ("BloodPressure", 72), ("SkinThickness", 35),
+                    ("Insulin", 0), ("BMI", 33.6), ("Genetic Correlation", 0.627), ("Pregnancies", 6), ("Age", 50)]
+    report_args = ("Bench User", measurements, "The person has a high risk of diabetes type 2",
+                   "The model used is trusted by doctors and has an accuracy of 95.0%")
+    token = utils.cipher.encrypt(SAMPLE_QUERY.encode())
+
+    results = {
+        "report.render": measure(lambda: report.render_report(*report_args), repeat),
+        "report.cached": measure(lambda: report.build_report(*report_args), max(repeat, 100)),
+        "fernet.encrypt": measure(lambda: utils.cipher.encrypt(SAMPLE_QUERY.encode()), max(repeat, 1000)),
+        "fernet.decrypt": measure(lambda: utils.cipher.decrypt(token), max(repeat, 1000)),
+    }
+    for page in ["Login", "Home", "Ask Queries", "Result", "Knowledge Center"]:
+        results[f"page.{page}"] = measure(lambda: render_page(page), repeat)
+    results["talk2doc.ask"] = measure(ask_capsule, repeat)
+    return results
+
+
+def environment():
+    def package_version(name):
+        try:
+            from importlib.metadata import version
+            return version(name)
+        except Exception:
+            return None
+
+    try:
+        commit = subprocess.run(["git", "-C", REPO, "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": {name: package_version(name) for name in
+                     ["streamlit", "numpy", "pandas", "scikit-learn", "matplotlib", "fpdf", "pymongo", "cryptography"]},
+    }
+
+
+def compare(current, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["benchmarks"]
+    regressions = []
+    print(f"\n{'benchmark':<45}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["median_s"], result["median_s"]
+        ratio = new / old if old else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<45}{old * 1000:>10.2f}ms{new * 1000:>10.2f}ms{ratio:>7.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated dataset sizes (rows)")
+    parser.add_argument("--large", action="store_true", help=f"also run the {LARGE_SIZE:,}-row dataset")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workdir", help="scratch directory (default: a new temporary directory)")
+    parser.add_argument("--out", default=os.path.join(REPO, "benchmarks", "results", "baseline.json"))
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    if args.large and LARGE_SIZE not in sizes:
+        sizes.append(LARGE_SIZE)
+    out = os.path.abspath(args.out)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="dhcp-bench-")
+    prepare_workspace(workdir)
+    # Streamlit finds .streamlit/secrets.toml relative to the working directory
+    os.chdir(workdir)
+    os.environ["LLM_BACKEND"] = "stub"
+
+    import db
+    import llm
+    from fakes import FakeMongoClient
+
+    db.set_client(FakeMongoClient())
+    llm.set_backend(llm.StubBackend())
+    seed_database()
+
+    benchmarks = {}
+    for rows in sizes:
+        print(f"Dataset of {rows:,} rows...", flush=True)
+        for name, result in bench_dataset(rows, args.repeat).items():
+            benchmarks[f"{name}[rows={rows}]"] = result
+    print("Reports, encryption and pages...", flush=True)
+    benchmarks.update(bench_common(args.repeat))
+
+    for name, result in benchmarks.items():
+        print(f"{name:<45}{result['median_s'] * 1000:>10.2f}ms  (first {result['first_s'] * 1000:.2f}ms)")
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"environment": environment(), "sizes": sizes, "benchmarks": benchmarks}, f, indent=2)
+    print(f"\nWrote {out}")
+
+    if baseline:
+        regressions = compare(benchmarks, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold}x the baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
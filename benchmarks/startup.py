@@ -0,0 +1,105 @@
+"""Cold-start benchmark: how long until the Login page is rendered.
+
+    python benchmarks/startup.py [--runs 5] [--app main.py] [--fake-db] [--json out.json]
+
+Run it from the directory holding .streamlit/secrets.toml. Each run starts a
+fresh interpreter (so nothing is already in sys.modules), renders the app once
+with streamlit's AppTest and reports:
+
+  import_s   time spent importing modules during that first render
+             (from `python -X importtime`, streamlit itself excluded)
+  login_s    wall time of the first render, i.e. time to the Login page
+  heavy      heavy libraries that render pulled in
+
+--fake-db swaps the MongoDB client for the in-process stand-in in fakes.py so
+the numbers don't include network round trips.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'fpdf', 'google.generativeai', 'PIL', 'pandas']
+
+MARKER = '--- render ---'
+
+CHILD = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+if {fake_db!r}:
+    import db
+    from fakes import FakeMongoClient
+    db.set_client(FakeMongoClient())
+at = AppTest.from_file({app!r}, default_timeout=300)
+sys.stderr.write({marker!r} + '\\n'); sys.stderr.flush()
+start = time.perf_counter()
+at.run()
+login_s = time.perf_counter() - start
+if at.exception:
+    raise SystemExit('App raised: %s' % at.exception[0].message)
+print(json.dumps({{'login_s': login_s, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def render_imports_seconds(stderr):
+    # Sum the cumulative time of top-level imports after the marker; nested
+    # imports are indented and already counted in their parent
+    total_us = 0
+    seen_marker = False
+    for line in stderr.splitlines():
+        if line.strip() == MARKER:
+            seen_marker = True
+            continue
+        if not seen_marker or not line.startswith('import time:'):
+            continue
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        if parts[2].startswith('  '):
+            continue  # nested import
+        total_us += int(parts[1])
+    return total_us / 1e6
+
+
+def run_once(app, fake_db):
+    app = os.path.abspath(app)
+    code = CHILD.format(app=app, fake_db=fake_db, marker=MARKER, heavy=HEAVY)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join([os.path.dirname(app), os.path.dirname(os.path.abspath(__file__))])},
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['import_s'] = render_imports_seconds(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to the Login page.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--app', default='main.py')
+    parser.add_argument('--fake-db', action='store_true', help="use an in-process MongoDB stand-in instead of the configured server")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(args.app, args.fake_db) for _ in range(args.runs)]
+    summary = {
+        'app': args.app,
+        'runs': args.runs,
+        'import_s': statistics.median(r['import_s'] for r in runs),
+        'login_s': statistics.median(r['login_s'] for r in runs),
+        'heavy': runs[-1]['heavy'],
+    }
+    print(f"import {summary['import_s']:.3f}s  login page {summary['login_s']:.3f}s  "
+          f"(median of {args.runs}); heavy modules loaded: {', '.join(summary['heavy']) or 'none'}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({**summary, 'samples': runs}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Synthetic data shaped like diabetes.csv, for benchmarks.
+
+    python benchmarks/synthetic.py --rows 100000 --out diabetes.csv
+
+Values are drawn in the dataset's ranges and Outcome (0-5) depends on
+HbA1c/glucose/age/pregnancies, so the tree has something to learn. Rows are
+written in chunks, so 10M rows don't need the whole frame in memory.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI',
+           'DiabetesPedigreeFunction', 'Age', 'HbA1c_level', 'Outcome']
+
+CHUNK_ROWS = 1_000_000
+
+
+def make_chunk(rows, rng):
+    glucose = rng.normal(120, 32, rows).clip(0, 199).round()
+    hba1c = rng.normal(5.6, 1.0, rows).clip(3.5, 9.0).round(1)
+    age = rng.integers(21, 82, rows)
+    pregnancies = rng.poisson(3, rows).clip(0, 17)
+    bmi = rng.normal(32, 7, rows).clip(15, 67).round(1)
+
+    outcome = np.zeros(rows, dtype=np.int64)
+    outcome[(hba1c >= 5.7) & (hba1c < 6.5)] = 4
+    outcome[(hba1c >= 6.5) & (age < 30)] = 1
+    outcome[(hba1c >= 6.5) & (age >= 30)] = 2
+    outcome[(glucose > 150) & (pregnancies > 0) & (age < 40) & (outcome == 0)] = 3
+    outcome[rng.random(rows) < 0.02] = 5
+
+    return pd.DataFrame({
+        'Pregnancies': pregnancies,
+        'Glucose': glucose.astype(np.int64),
+        'BloodPressure': rng.normal(70, 12, rows).clip(0, 122).round().astype(np.int64),
+        'SkinThickness': rng.normal(20, 10, rows).clip(0, 99).round().astype(np.int64),
+        'Insulin': rng.exponential(80, rows).clip(0, 846).round().astype(np.int64),
+        'BMI': bmi,
+        'DiabetesPedigreeFunction': rng.gamma(2, 0.25, rows).clip(0.078, 2.42).round(3),
+        'Age': age,
+        'HbA1c_level': hba1c,
+        'Outcome': outcome,
+    }, columns=COLUMNS)
+
+
+def write_dataset(path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    rng = np.random.default_rng(seed)
+    written = 0
+    while written < rows:
+        chunk = make_chunk(min(chunk_rows, rows - written), rng)
+        chunk.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += len(chunk)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic diabetes.csv-shaped dataset.")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--out', default='diabetes.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_dataset(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""PDF reports for a whole cohort, rendered in parallel and written into one zip.
+
+    python bulk_reports.py cohort.csv --out reports.zip [--workers 4]
+
+Reports are rendered by report.render_report in a process pool (fpdf is pure
+Python, so threads would take turns on the GIL). At most `max_in_flight`
+reports are pending at once and each finished PDF goes straight into the
+archive, so memory stays flat however large the cohort is.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from report import render_report
+
+# Columns used to name a patient's report, in order of preference
+NAME_COLUMNS = ["Name", "Patient", "Patient ID", "PatientID", "patient_id", "ID", "id"]
+
+# Labels the single-patient report uses for these features
+FEATURE_LABELS = {
+    'HbA1c_level': "HbA1c Level",
+    'DiabetesPedigreeFunction': "Genetic Correlation",
+}
+
+
+def report_filename(index, name):
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(name)).strip("_") or "patient"
+    return f"{index:05d}_{safe}.pdf"
+
+
+def cohort_report_jobs(results):
+    """Turn score_cohort() output into (filename, render_report kwargs) pairs."""
+    from web_functions import FEATURE_COLUMNS
+
+    name_column = next((col for col in NAME_COLUMNS if col in results.columns), None)
+    jobs = []
+    for position, (index, row) in enumerate(results.iterrows()):
+        name = row[name_column] if name_column else f"patient-{index}"
+        jobs.append((report_filename(position, name), {
+            "user_name": str(name),
+            "measurements": [(FEATURE_LABELS.get(col, col), row[col]) for col in FEATURE_COLUMNS],
+            "prediction_result": row['Disease Type'],
+        }))
+    return jobs
+
+
+def _init_worker():
+    # Workers can't report their histograms back, so don't make them read secrets for it
+    os.environ["TELEMETRY_ENABLED"] = "0"
+
+
+def _render_job(job):
+    # Runs in a worker process
+    filename, kwargs = job
+    return filename, render_report(**kwargs)
+
+
+def write_reports_zip(jobs, target, max_workers=None, max_in_flight=None, on_progress=None):
+    """Render every (filename, kwargs) job and add the PDFs to a zip written to `target`.
+
+    `target` is a path or a binary file object. Returns
+    {"written": n, "failed": [(filename, error), ...]}; failures are also listed
+    in errors.txt inside the archive. `on_progress(done, total)` is called from
+    the calling thread. If the caller is interrupted (Ctrl-C, a Streamlit
+    rerun), reports not yet started are cancelled.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    total = len(jobs)
+    written, failed = 0, []
+
+    # spawn, not fork: the Streamlit server process has many threads running
+    pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker)
+    try:
+        with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            pending = {}
+            remaining = iter(jobs)
+            while True:
+                # Keep the pool busy without queueing the whole cohort
+                for job in remaining:
+                    pending[pool.submit(_render_job, job)] = job[0]
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename = pending.pop(future)
+                    try:
+                        name, pdf_bytes = future.result()
+                        archive.writestr(name, pdf_bytes)
+                        written += 1
+                    except Exception as e:
+                        failed.append((filename, str(e)))
+                    if on_progress:
+                        on_progress(written + len(failed), total)
+
+            if failed:
+                archive.writestr("errors.txt", "".join(f"{name}: {error}\n" for name, error in failed))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return {"written": written, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a cohort CSV and write one PDF report per patient into a zip.")
+    parser.add_argument('cohort', help="CSV with one row per patient")
+    parser.add_argument('--out', default='reports.zip', help="zip file to write")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    from cohort import read_cohort, score_cohort
+
+    jobs = cohort_report_jobs(score_cohort(read_cohort(args.cohort)))
+
+    def progress(done, total):
+        print(f"\r{done}/{total} reports", end="", file=sys.stderr, flush=True)
+
+    summary = write_reports_zip(jobs, args.out, max_workers=args.workers, on_progress=progress)
+    print(file=sys.stderr)
+    print(f"Wrote {summary['written']} reports to {args.out} ({len(summary['failed'])} failed)")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
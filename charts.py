@@ -0,0 +1,111 @@
+"""PNG charts for the Result dashboard.
+
+Charts are drawn with matplotlib's object-oriented Figure API: no pyplot, so
+no global figure registry or style state to leak across reruns and sessions,
+and a figure is garbage as soon as its PNG has been written. Rendered PNGs are
+kept in a small LRU keyed on a hash of the plotted data, so a rerun with
+unchanged data doesn't draw anything.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Bump when a chart's look changes so cached PNGs aren't reused
+CHART_VERSION = 1
+
+CHART_CACHE_SIZE = 256
+
+NEON = ['#FF00FF', '#00FFFF', '#00FF00', '#FFFF00', '#FF4500']
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _digest(name, parts):
+    sha = hashlib.sha256(f"{CHART_VERSION}:{name}".encode())
+    for part in parts:
+        array = np.asarray(part)
+        sha.update(f"{array.dtype}{array.shape}".encode())
+        sha.update(array.tobytes() if array.dtype != object else repr(part).encode())
+    return sha.hexdigest()
+
+
+def _dark_figure():
+    # The look of the old plt.style.use("dark_background"), set on this figure only
+    from matplotlib.figure import Figure
+
+    fig = Figure(facecolor='black')
+    ax = fig.subplots()
+    ax.set_facecolor('black')
+    ax.tick_params(colors='white')
+    for spine in ax.spines.values():
+        spine.set_color('white')
+    return fig, ax
+
+
+def _render(name, draw, *parts):
+    """Return PNG bytes of draw(ax, *parts), from the cache when the data is unchanged."""
+    key = _digest(name, parts)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    fig, ax = _dark_figure()
+    try:
+        draw(ax, *parts)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', facecolor=fig.get_facecolor())
+    finally:
+        fig.clear()
+    png = buffer.getvalue()
+
+    with _lock:
+        _cache[key] = png
+        _cache.move_to_end(key)
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return png
+
+
+def _legend(ax):
+    ax.legend(facecolor='black', edgecolor='white', labelcolor='white')
+
+
+def _draw_feature_trend(ax, times, average, low, high, title, ylabel):
+    ax.fill_between(times, low, high, color='#00FFFF', alpha=0.25, label='Range')  # Neon cyan
+    ax.plot(times, average, marker='o', linestyle='-', label='Average', color='#FF00FF')  # Neon pink
+    ax.set_title(title, color='white')
+    ax.set_xlabel("Date", color='white')
+    ax.set_ylabel(ylabel, color='white')
+    ax.figure.autofmt_xdate()
+    _legend(ax)
+
+
+def _draw_insulin_comparison(ax, patient, healthy):
+    ax.bar(["Patient"], [patient], color='#00FF00', label='Patient')  # Neon green
+    ax.bar(["Healthy"], [healthy], color='#FF4500', label='Healthy')  # Neon orange-red
+    ax.set_title("Insulin Levels Comparison", color='white')
+    ax.set_ylabel("Insulin Level (μU/mL)", color='white')
+    _legend(ax)
+
+
+def _draw_class_distribution(ax, labels, counts):
+    ax.pie(counts, labels=list(labels), autopct='%1.1f%%', startangle=140, colors=NEON, textprops={'color': "blue"})
+    ax.set_title("Diabetes Classification Distribution", color='white')
+
+
+def feature_trend(times, average, low, high, title, ylabel):
+    """Line of per-bucket averages over a min-max band; times are datetime64 values."""
+    return _render("feature_trend", _draw_feature_trend, times, average, low, high, title, ylabel)
+
+
+def insulin_comparison(patient, healthy):
+    return _render("insulin_comparison", _draw_insulin_comparison, patient, healthy)
+
+
+def class_distribution(labels, counts):
+    return _render("class_distribution", _draw_class_distribution, labels, counts)
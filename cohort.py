@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from web_functions import FEATURE_COLUMNS, predict_batch
+
+# Column headers accepted in an uploaded cohort file, mapped to training features.
+# The labels used by the single-patient CSV work as well as the dataset's names.
+COLUMN_ALIASES = {
+    'HbA1c Level': 'HbA1c_level',
+    'Genetic Correlation': 'DiabetesPedigreeFunction',
+    **{col: col for col in FEATURE_COLUMNS},
+}
+
+CHUNK_ROWS = 10_000
+
+
+def disease_type(prediction, pregnancies):
+    if prediction == 1:
+        return "High risk of diabetes type 1"
+    elif prediction == 2:
+        return "High risk of diabetes type 2"
+    elif prediction == 3 and pregnancies > 0:
+        return "High risk of gestational diabetes"
+    elif prediction == 4:
+        return "Prediabetes"
+    elif prediction == 5:
+        return "Monogenic Diabetes or Type 3c diabetes"
+    return "No diabetes detected"
+
+
+def read_cohort(file, chunksize=CHUNK_ROWS):
+    """Parse a wide CSV (one row per patient) in chunks into training feature names.
+
+    Columns that aren't features (patient IDs, names...) are kept so they end up
+    in the results file. Raises ValueError if a feature column is missing.
+    """
+    chunks = []
+    for chunk in pd.read_csv(file, chunksize=chunksize):
+        chunk = chunk.rename(columns=lambda col: COLUMN_ALIASES.get(col.strip(), col.strip()))
+        missing = [col for col in FEATURE_COLUMNS if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        chunk[FEATURE_COLUMNS] = chunk[FEATURE_COLUMNS].apply(pd.to_numeric, errors='coerce')
+        chunk['Pregnancies'] = chunk['Pregnancies'].fillna(0).astype(int)
+        chunks.append(chunk)
+    if not chunks:
+        raise ValueError("The file has no patient rows")
+    return pd.concat(chunks, ignore_index=True)
+
+
+def score_cohort(cohort):
+    """Add Prediction, Disease Type and Probability columns using one batched model call."""
+    incomplete = cohort[FEATURE_COLUMNS].isna().any(axis=1)
+    results = cohort.copy()
+    results['Prediction'] = pd.NA
+    results['Probability'] = pd.NA
+
+    scored = results.loc[~incomplete]
+    if len(scored):
+        labels, probabilities, _ = predict_batch(scored[FEATURE_COLUMNS])
+        results.loc[~incomplete, 'Prediction'] = labels
+        results.loc[~incomplete, 'Probability'] = probabilities.max(axis=1).round(4)
+
+    results['Disease Type'] = [
+        disease_type(prediction, pregnancies) if not missing else "Incomplete data"
+        for prediction, pregnancies, missing
+        in zip(results['Prediction'], results['Pregnancies'], incomplete)
+    ]
+    return results
+
+
+def recommend_all(patients, recommend, max_workers=4, on_progress=None):
+    """Call `recommend(disease_type, patient_data)` for every (index, disease, data) item.
+
+    Runs on a bounded thread pool and returns {index: recommendation}. A failing
+    patient gets an error message instead of stopping the batch. `on_progress`
+    is called with (done, total) from the calling thread, so it can update
+    Streamlit elements.
+    """
+    results = {}
+    total = len(patients)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            pool.submit(recommend, disease, patient_data): index
+            for index, disease, patient_data in patients
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                results[index] = f"Recommendation unavailable: {e}"
+            if on_progress:
+                on_progress(done, total)
+    finally:
+        # If the page is interrupted, don't start calls for the remaining patients
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
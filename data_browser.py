@@ -0,0 +1,77 @@
+"""Server-side paging over the (possibly memory-mapped) dataset.
+
+The Data Source tab used to send the whole frame to the browser. DataBrowser
+evaluates filters and sorting here, on the column arrays, and returns only the
+rows of the requested page, so that's all Streamlit serializes.
+"""
+import operator
+import threading
+
+import numpy as np
+
+# Filter operators offered in the UI
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class DataBrowser:
+    """Filter, sort and page a DataFrame that is shared read-only by every session."""
+
+    def __init__(self, df):
+        self.df = df
+        self.rows = len(df)
+        self._index_dtype = np.int32 if self.rows < 2 ** 31 else np.int64
+        self._sort_orders = {}
+        self._lock = threading.Lock()
+
+    def sort_order(self, column):
+        """Row positions in ascending order of `column`, computed once per column."""
+        with self._lock:
+            order = self._sort_orders.get(column)
+        if order is None:
+            order = np.argsort(self.df[column].to_numpy(), kind="stable").astype(self._index_dtype)
+            with self._lock:
+                self._sort_orders.setdefault(column, order)
+        return order
+
+    def mask(self, filters):
+        """Boolean row mask for a list of (column, operator, value) predicates, or None."""
+        mask = None
+        for column, op, value in filters:
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown filter operator: {op}")
+            matches = OPERATORS[op](self.df[column].to_numpy(), value)
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    def query(self, columns=None, filters=(), sort_by=None, descending=False, page=0, page_size=50):
+        """Return (page DataFrame, number of matching rows).
+
+        `filters` are ANDed together. Only the rows of page `page` (0-based) and
+        the requested `columns` are copied out of the shared frame.
+        """
+        mask = self.mask(filters)
+        if sort_by is not None:
+            order = self.sort_order(sort_by)
+            if descending:
+                order = order[::-1]
+            if mask is not None:
+                order = order[mask[order]]
+        elif mask is not None:
+            order = np.flatnonzero(mask)
+        else:
+            order = None
+
+        total = self.rows if order is None else len(order)
+        start = max(page, 0) * page_size
+        stop = min(start + page_size, total)
+        positions = np.arange(start, stop) if order is None else order[start:stop]
+
+        frame = self.df[list(columns)] if columns else self.df
+        return frame.iloc[positions], total
@@ -0,0 +1,373 @@
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, TypedDict
+
+import streamlit as st
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient, monitoring
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+import telemetry
+
+DB_NAME = "diabetes_app"
+
+# Pool defaults, each can be overridden in the [mongodb] section of secrets.toml
+POOL_DEFAULTS = {
+    "max_pool_size": 50,
+    "min_pool_size": 0,
+    "max_idle_time_ms": 300_000,
+    "wait_queue_timeout_ms": 5_000,
+    "server_selection_timeout_ms": 5_000,
+    "connect_timeout_ms": 5_000,
+    "socket_timeout_ms": 20_000,
+}
+
+
+class UserDoc(TypedDict):
+    name: str
+    username: str
+    hashed_password: str
+    created_at: datetime
+
+
+class QueryDoc(TypedDict):
+    user: str
+    timestamp: datetime
+    query: bytes
+
+
+class PredictionDoc(TypedDict):
+    user: str
+    timestamp: datetime
+    features: Dict[str, float]
+    label: int
+    model_version: str
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts connections and check-out waits for the shared client's pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open_connections": self.open,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": 1000 * self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+            }
+
+    def connection_checked_out(self, event):
+        # duration is the time spent waiting for the pool (pymongo >= 4.7)
+        wait = getattr(event, "duration", 0.0) or 0.0
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+pool_stats_listener = PoolStats()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _pool_settings():
+    settings = dict(POOL_DEFAULTS)
+    mongo_secrets = st.secrets["mongodb"]
+    for name in POOL_DEFAULTS:
+        if name in mongo_secrets:
+            settings[name] = int(mongo_secrets[name])
+    return mongo_secrets["uri"], settings
+
+
+def get_client():
+    """Return the single MongoClient shared by every session in this process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                uri, settings = _pool_settings()
+                _client = MongoClient(
+                    uri,
+                    maxPoolSize=settings["max_pool_size"],
+                    minPoolSize=settings["min_pool_size"],
+                    maxIdleTimeMS=settings["max_idle_time_ms"],
+                    waitQueueTimeoutMS=settings["wait_queue_timeout_ms"],
+                    serverSelectionTimeoutMS=settings["server_selection_timeout_ms"],
+                    connectTimeoutMS=settings["connect_timeout_ms"],
+                    socketTimeoutMS=settings["socket_timeout_ms"],
+                    connect=False,  # Don't open sockets until the first operation
+                    event_listeners=[pool_stats_listener],
+                )
+    return _client
+
+
+def set_client(client):
+    """Replace the shared client, e.g. with an in-process stand-in for benchmarks."""
+    global _client
+    with _client_lock:
+        _client = client
+    _indexed.clear()
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def pool_stats():
+    return pool_stats_listener.snapshot()
+
+
+class UsersRepository:
+    """Access to the `users` collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        # Logins look users up by username only, so back that with a unique index
+        try:
+            self.collection.create_index("username", unique=True)
+        except OperationFailure as e:
+            # Existing duplicate usernames make the unique build fail; lookups still work
+            print(f"Could not create unique username index: {e}")
+
+    @telemetry.timed("db", op="users.find_by_username")
+    def find_by_username(self, username: str) -> Optional[UserDoc]:
+        return self.collection.find_one({"username": username}, {"_id": 0})
+
+    @telemetry.timed("db", op="users.insert")
+    def insert(self, user_doc: UserDoc) -> None:
+        self.collection.insert_one(user_doc)
+
+    @telemetry.timed("db", op="users.update_password")
+    def update_password(self, username: str, hashed_password: str) -> None:
+        self.collection.update_one({"username": username}, {"$set": {"hashed_password": hashed_password}})
+
+
+class UserDataRepository:
+    """Access to the `user_data` collection holding encrypted chatbot queries."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @telemetry.timed("db", op="user_data.insert_query")
+    def insert_query(self, query_doc: QueryDoc) -> None:
+        self.collection.insert_one(query_doc)
+
+    @telemetry.timed("db", op="user_data.insert_queries")
+    def insert_queries(self, query_docs: List[QueryDoc]) -> None:
+        # Unordered so one bad document doesn't hold back the rest of the batch
+        self.collection.insert_many(query_docs, ordered=False)
+
+    def ensure_indexes(self):
+        # Serves both the per-user filter and the newest-first sort; _id breaks
+        # timestamp ties so page boundaries are stable
+        self.collection.create_index(
+            [("user", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]
+        )
+
+    def find_by_user(self, username: str, batch_size: int = 500) -> Iterator[QueryDoc]:
+        return self.collection.find({"user": username}).sort(
+            [("timestamp", DESCENDING), ("_id", DESCENDING)]
+        ).batch_size(batch_size)
+
+    @telemetry.timed("db", op="user_data.find_page")
+    def find_page(self, username: str, before: Optional[Tuple[datetime, ObjectId]] = None,
+                  limit: int = 20) -> List[QueryDoc]:
+        """Newest-first page of a user's queries, starting after the `before` key."""
+        query = {"user": username}
+        if before is not None:
+            timestamp, doc_id = before
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": doc_id}},
+            ]
+        cursor = self.collection.find(query).sort(
+            [("timestamp", DESCENDING), ("_id", DESCENDING)]
+        ).limit(limit)
+        return list(cursor)
+
+
+# $dateTrunc units from finest to coarsest, with their (approximate) length in seconds
+BUCKET_UNITS = [
+    ("minute", 60),
+    ("hour", 3600),
+    ("day", 86_400),
+    ("week", 7 * 86_400),
+    ("month", 30 * 86_400),
+    ("quarter", 91 * 86_400),
+    ("year", 365 * 86_400),
+]
+
+
+def bucket_for_span(seconds: float, max_points: int) -> Tuple[str, int]:
+    """Finest (unit, binSize) that splits a time span into at most max_points buckets."""
+    for unit, unit_seconds in BUCKET_UNITS:
+        if seconds / unit_seconds <= max_points:
+            return unit, 1
+    unit, unit_seconds = BUCKET_UNITS[-1]
+    return unit, int(-(-seconds // (unit_seconds * max_points)))
+
+
+class PredictionsRepository:
+    """Access to the `predictions` time series: one document per Diagnosis prediction."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        database, name = self.collection.database, self.collection.name
+        if name not in database.list_collection_names():
+            try:
+                # Time series storage (MongoDB >= 5.0) buckets a user's readings together
+                database.create_collection(
+                    name, timeseries={"timeField": "timestamp", "metaField": "user", "granularity": "hours"}
+                )
+            except (CollectionInvalid, OperationFailure) as e:
+                # Created by another process meanwhile, or an older server: a plain collection works too
+                print(f"Could not create predictions time series collection: {e}")
+        self.collection.create_index([("user", ASCENDING), ("timestamp", ASCENDING)])
+
+    @telemetry.timed("db", op="predictions.insert")
+    def insert(self, prediction_doc: PredictionDoc) -> None:
+        self.collection.insert_one(prediction_doc)
+
+    @telemetry.timed("db", op="predictions.latest")
+    def latest(self, username: str) -> Optional[PredictionDoc]:
+        return self.collection.find_one({"user": username}, {"_id": 0}, sort=[("timestamp", DESCENDING)])
+
+    @telemetry.timed("db", op="predictions.time_range")
+    def time_range(self, username: str, since: Optional[datetime] = None) -> Optional[Tuple[datetime, datetime]]:
+        # Two index-only lookups rather than a $group over every reading
+        query = {"user": username}
+        if since is not None:
+            query["timestamp"] = {"$gte": since}
+        first = self.collection.find_one(query, {"timestamp": 1}, sort=[("timestamp", ASCENDING)])
+        if first is None:
+            return None
+        last = self.collection.find_one(query, {"timestamp": 1}, sort=[("timestamp", DESCENDING)])
+        return first["timestamp"], last["timestamp"]
+
+    @telemetry.timed("db", op="predictions.feature_series")
+    def feature_series(self, username: str, feature: str, since: Optional[datetime] = None,
+                       max_points: int = 60) -> List[dict]:
+        """Downsampled history of one feature: [{"_id": bucket start, "avg", "min", "max", "count"}].
+
+        The bucket size is picked from the time span so at most about max_points
+        buckets come back, and the averaging runs on the server, so a user with
+        years of readings still only transfers the points that get plotted.
+        """
+        span = self.time_range(username, since)
+        if span is None:
+            return []
+        unit, bin_size = bucket_for_span((span[1] - span[0]).total_seconds(), max_points)
+
+        match = {"user": username}
+        if since is not None:
+            match["timestamp"] = {"$gte": since}
+        value = f"$features.{feature}"
+        return list(self.collection.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size}},
+                "avg": {"$avg": value},
+                "min": {"$min": value},
+                "max": {"$max": value},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id": ASCENDING}},
+        ]))
+
+    @telemetry.timed("db", op="predictions.label_counts")
+    def label_counts(self, username: str, since: Optional[datetime] = None) -> Dict[int, int]:
+        match = {"user": username}
+        if since is not None:
+            match["timestamp"] = {"$gte": since}
+        groups = self.collection.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$label", "count": {"$sum": 1}}},
+            {"$sort": {"_id": ASCENDING}},
+        ])
+        return {group["_id"]: group["count"] for group in groups}
+
+
+_indexed = set()
+_index_lock = threading.Lock()
+
+
+def _ensure_once(name, repository):
+    # create_index is idempotent but still a round-trip, so do it once per process
+    if name in _indexed:
+        return
+    with _index_lock:
+        if name not in _indexed:
+            repository.ensure_indexes()
+            _indexed.add(name)
+
+
+def users() -> UsersRepository:
+    repository = UsersRepository(get_db()["users"])
+    _ensure_once("users", repository)
+    return repository
+
+
+def user_data() -> UserDataRepository:
+    repository = UserDataRepository(get_db()["user_data"])
+    _ensure_once("user_data", repository)
+    return repository
+
+
+def predictions() -> PredictionsRepository:
+    repository = PredictionsRepository(get_db()["predictions"])
+    _ensure_once("predictions", repository)
+    return repository
@@ -0,0 +1,316 @@
+import hashlib
+import os
+import random
+import threading
+import time
+
+import streamlit as st
+
+import telemetry
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Gateway limits, each can be overridden in the [llm] section of secrets.toml
+GATEWAY_DEFAULTS = {
+    "max_concurrent": 8,      # calls in flight across all sessions of this process
+    "rate_per_second": 2.0,   # token bucket refill rate
+    "burst": 5,               # token bucket size
+    "max_wait": 20.0,         # seconds a call may queue for a slot or token
+    "timeout": 30.0,          # seconds per model call
+    "max_retries": 3,
+    "backoff_base": 0.5,
+    "backoff_max": 8.0,
+}
+
+
+class LLMUnavailableError(RuntimeError):
+    """The model could not answer (overloaded, rate limited or timed out)."""
+
+
+class LLMBackend:
+    """Interface every text-generation backend implements."""
+
+    def generate(self, prompt, timeout=None):
+        """Return the whole answer as one string."""
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout=None):
+        """Yield the answer in chunks as they are produced."""
+        raise NotImplementedError
+
+    def is_retryable(self, error):
+        """Whether `error` is transient (rate limit, overload) and worth retrying."""
+        return isinstance(error, TimeoutError)
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, api_key, model_name=DEFAULT_MODEL):
+        import google.generativeai as genai
+        from google.api_core import exceptions as api_exceptions
+
+        if not api_key:
+            raise ValueError("Gemini API key is missing! Add it to Streamlit secrets.")
+        genai.configure(api_key=api_key)
+        # Model handles are stateless, so one per model name is shared by every call
+        self._model = genai.GenerativeModel(model_name)
+        self._retryable = (
+            api_exceptions.ResourceExhausted,    # 429
+            api_exceptions.ServiceUnavailable,   # 503
+            api_exceptions.InternalServerError,  # 500
+            api_exceptions.DeadlineExceeded,
+            TimeoutError,
+        )
+
+    def generate(self, prompt, timeout=None):
+        return self._model.generate_content(prompt, request_options={"timeout": timeout}).text
+
+    def stream(self, prompt, timeout=None):
+        response = self._model.generate_content(
+            prompt, stream=True, request_options={"timeout": timeout}
+        )
+        for chunk in response:
+            # Safety-filtered or empty chunks have no text parts
+            if chunk.parts:
+                yield chunk.text
+
+    def is_retryable(self, error):
+        return isinstance(error, self._retryable)
+
+
+class StubBackend(LLMBackend):
+    """Deterministic offline backend: the same prompt always gives the same answer."""
+
+    def __init__(self, chunk_delay=0.0):
+        self.chunk_delay = chunk_delay
+
+    def generate(self, prompt, timeout=None):
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt, timeout=None):
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        words = f"Stub answer {digest} for a prompt of {len(prompt)} characters.".split(" ")
+        for i, word in enumerate(words):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield word if i == 0 else " " + word
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait):
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class LLMGateway:
+    """Process-wide entry point for model calls.
+
+    Bounds the calls in flight with a semaphore, paces them with a token
+    bucket, gives each call a timeout and retries transient failures with
+    jittered exponential backoff. Failures that survive the retries are raised
+    as LLMUnavailableError so pages can show a friendly message.
+    """
+
+    def __init__(self, backend, max_concurrent=8, rate_per_second=2.0, burst=5,
+                 max_wait=20.0, timeout=30.0, max_retries=3, backoff_base=0.5,
+                 backoff_max=8.0):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._bucket = TokenBucket(rate_per_second, burst)
+
+    def _backoff(self, attempt):
+        # "Full jitter": spread retries out so they don't arrive as a new storm
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.max_wait):
+            raise LLMUnavailableError("Too many requests in flight, please try again shortly.")
+        if not self._bucket.acquire(self.max_wait):
+            self._slots.release()
+            raise LLMUnavailableError("Rate limit reached, please try again shortly.")
+
+    def _call(self, attempt_fn):
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                return attempt_fn()
+            except Exception as e:
+                if not self.backend.is_retryable(e):
+                    raise
+                if attempt >= self.max_retries:
+                    raise LLMUnavailableError(
+                        "The AI service is busy right now, please try again in a moment."
+                    ) from e
+            finally:
+                self._slots.release()
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    @telemetry.timed("llm", op="generate")
+    def generate(self, prompt):
+        return self._call(lambda: self.backend.generate(prompt, timeout=self.timeout))
+
+    def stream(self, prompt):
+        """Yield chunks of the answer; retries only happen before the first chunk."""
+        attempt = 0
+        while True:
+            self._acquire()
+            started = False
+            try:
+                for chunk in self.backend.stream(prompt, timeout=self.timeout):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if not self.backend.is_retryable(e):
+                    raise
+                # Once text has been shown a retry would repeat it, so give up
+                if started or attempt >= self.max_retries:
+                    raise LLMUnavailableError(
+                        "The AI service is busy right now, please try again in a moment."
+                    ) from e
+            finally:
+                self._slots.release()
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+
+class StreamTimings:
+    """Time-to-first-token and total time of streamed answers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ttft = 0.0
+        self.total_time = 0.0
+        self.last_ttft = None
+        self.last_total = None
+
+    def record(self, ttft, total):
+        with self._lock:
+            self.count += 1
+            self.total_ttft += ttft
+            self.total_time += total
+            self.last_ttft = ttft
+            self.last_total = total
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "streams": self.count,
+                "avg_ttft_seconds": self.total_ttft / self.count if self.count else 0.0,
+                "avg_total_seconds": self.total_time / self.count if self.count else 0.0,
+                "last_ttft_seconds": self.last_ttft,
+                "last_total_seconds": self.last_total,
+            }
+
+
+stream_timings = StreamTimings()
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def _llm_secrets():
+    try:
+        return st.secrets.get("llm", {})
+    except FileNotFoundError:
+        return {}
+
+
+def _gateway_settings():
+    settings = dict(GATEWAY_DEFAULTS)
+    llm_secrets = _llm_secrets()
+    for name, default in GATEWAY_DEFAULTS.items():
+        if name in llm_secrets:
+            settings[name] = type(default)(llm_secrets[name])
+    return settings
+
+
+def _make_backend():
+    # LLM_BACKEND=stub (or [llm] backend = "stub" in secrets) runs without network access
+    name = os.environ.get("LLM_BACKEND") or _llm_secrets().get("backend", "gemini")
+    if name == "stub":
+        return StubBackend()
+    return GeminiBackend(st.secrets["gemini"]["api_key"])
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(_make_backend(), **_gateway_settings())
+    return _gateway
+
+
+def get_backend():
+    return get_gateway().backend
+
+
+def set_backend(backend, **settings):
+    """Route every call through `backend`, e.g. StubBackend() for offline runs."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = LLMGateway(backend, **{**_gateway_settings(), **settings})
+
+
+def generate(prompt):
+    return get_gateway().generate(prompt)
+
+
+class TimedStream:
+    """Iterate over a backend stream, recording TTFT and total time when it ends.
+
+    After iteration `ttft`, `total` and `text` hold the timings and the full answer.
+    """
+
+    def __init__(self, prompt, gateway=None):
+        self.prompt = prompt
+        self.gateway = gateway or get_gateway()
+        self.ttft = None
+        self.total = None
+        self.text = ""
+
+    def __iter__(self):
+        start = time.perf_counter()
+        parts = []
+        for chunk in self.gateway.stream(self.prompt):
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - start
+            parts.append(chunk)
+            yield chunk
+        self.total = time.perf_counter() - start
+        if self.ttft is None:
+            self.ttft = self.total
+        self.text = "".join(parts)
+        stream_timings.record(self.ttft, self.total)
+        telemetry.observe("llm", self.ttft, op="stream.ttft")
+        telemetry.observe("llm", self.total, op="stream.total")
+
+
+def stream(prompt):
+    return TimedStream(prompt)
@@ -1,12 +1,11 @@
+import importlib
 import streamlit as st
-from pymongo import MongoClient
-import streamlit_authenticator as stauth
-import bcrypt
 from cryptography.fernet import Fernet
 from datetime import datetime, timezone
-from web_functions import load_data
-from Tabs import diagnosis, home, result, kc, talk2doc
-from utils import store_user_query
+import db
+import telemetry
+from passwords import PasswordServiceBusyError, check_login, hash_password
+from auth import end_session, get_user_credentials, invalidate_user, remember_session, restore_session
 
 # Set page configuration as the first Streamlit command
 st.set_page_config(
@@ -16,11 +15,46 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
-# Connect to MongoDB
+# Page name -> module under Tabs/. A page's module (and the libraries it uses:
+# sklearn, matplotlib, fpdf, Gemini...) is imported the first time the page is
+# opened, so the Login page renders without any of them.
+PAGES = {
+    "Home": "Tabs.home",
+    "Ask Queries": "Tabs.talk2doc",
+    "Diagnosis": "Tabs.diagnosis",
+    "Result": "Tabs.result",
+    "Knowledge Center": "Tabs.kc",
+}
+
+def load_page(name):
+    # import_module returns the cached module after the first call
+    return importlib.import_module(PAGES[name])
+
+def profile():
+    from web_functions import load_profile
+    return {"profile": load_profile()}
+
+def browser():
+    from web_functions import load_browser
+    return {"browser": load_browser()}
+
+# What a page can list in its module-level DEPENDENCIES. Each provider returns
+# keyword arguments for the page's app(); only the rendered page's are resolved,
+# so Home and Ask Queries reruns never touch the dataset.
+DATA_PROVIDERS = {
+    "profile": profile,
+    "browser": browser,
+}
+
+def resolve_dependencies(page):
+    kwargs = {}
+    for name in getattr(page, "DEPENDENCIES", ()):
+        kwargs.update(DATA_PROVIDERS[name]())
+    return kwargs
+
+# Connect to MongoDB (one pooled client shared by the whole process)
 try:
-    client = MongoClient(st.secrets["mongodb"]["uri"])
-    db = client["diabetes_app"]
-    users_collection = db["users"]
+    users_repo = db.users()
 except Exception as e:
     st.error(f"Error connecting to MongoDB: {e}")
     st.stop()
@@ -33,19 +67,6 @@ except KeyError as e:
     st.error(f"Error loading encryption key: {e}")
     st.stop()
 
-def load_users():
-    users = {}
-    try:
-        for user_doc in users_collection.find():
-            users[user_doc["username"].lower()] = {
-                "name": user_doc["name"],
-                "password": user_doc["hashed_password"]
-            }
-        return users
-    except Exception as e:
-        st.error(f"Error loading users from database: {e}")
-        return {}
-
 def signup_page():
     st.title("📝 User Sign-Up")
 
@@ -65,14 +86,12 @@ def signup_page():
                 st.error("Passwords do not match!")
                 return
             username_lower = username.lower()
-            if users_collection.find_one({"username": username_lower}):
+            if get_user_credentials(username_lower):
                 st.error("Username already exists. Try another.")
                 return
 
-            # Hash password using streamlit-authenticator's Hasher
-            hasher = stauth.Hasher()
-            hashed_password = hasher.hash(password)
-            hashed_password = hashed_password[0] if isinstance(hashed_password, list) else hashed_password
+            # bcrypt on the password service's worker pool, at the configured cost
+            hashed_password = hash_password(password)
 
             user_doc = {
                 "name": name,
@@ -80,7 +99,8 @@ def signup_page():
                 "hashed_password": hashed_password,
                 "created_at": datetime.now(timezone.utc)
             }
-            users_collection.insert_one(user_doc)
+            users_repo.insert(user_doc)
+            invalidate_user(username_lower)
             st.success("✅ Account created successfully! You can now log in.")
         except Exception as e:
             st.error(f"Error during signup: {e}")
@@ -88,90 +108,50 @@ def signup_page():
 def login_page():
     st.title("🔐 Login")
 
-    # Clear authenticator from session state to avoid conflicts
-    if "authenticator" in st.session_state:
-        del st.session_state["authenticator"]
-
-    users = load_users()
-    if not users:
-        st.warning("No users found. Please sign up first!")
-        return False, None, None
-
-    # Prepare credentials for streamlit-authenticator
-    credentials = {
-        "usernames": {
-            username: {
-                "name": user["name"],
-                "password": user["password"]
-            }
-            for username, user in users.items()
-        }
-    }
+    # Only the submitted username is fetched (indexed lookup + in-process cache),
+    # so rendering this page never scans the users collection
+    with st.form("login_form"):
+        login_username = st.text_input("Username", key="login_username")
+        login_password = st.text_input("Password", type="password", key="login_password")
+        login_submit = st.form_submit_button("Login")
 
-    # Initialize authenticator
-    try:
-        authenticator = stauth.Authenticate(
-            credentials=credentials,
-            cookie_name="diabetes_app",
-            cookie_key="auth_key_123",  # Fixed key for consistency
-            cookie_expiry_days=30
-        )
-        st.session_state["authenticator"] = authenticator
-    except Exception as e:
-        st.error(f"Error initializing authenticator: {e}")
+    if not login_submit:
         return False, None, None
 
-    # Render login form
     try:
-        result = authenticator.login(key="login_form")
-        if isinstance(result, tuple) and len(result) == 2:
-            username, name = result
-            username_lower = username.lower()
-            st.session_state["username"] = username_lower
-            st.session_state["name"] = name
-            st.session_state["logged_in"] = True
-            st.success(f"Welcome {name}!")
-            return True, username_lower, name
-        elif result is False:
-            st.error("Username/password incorrect")
+        username_lower = login_username.lower()
+        user = get_user_credentials(username_lower) if username_lower else None
+        if user is None:
+            st.error("Username not found")
             return False, None, None
-        else:
-            # Fallback manual login form
-            st.subheader("Manual Login (Fallback)")
-            with st.form("manual_login_form"):
-                manual_username = st.text_input("Username", key="manual_login_username")
-                manual_password = st.text_input("Password", type="password", key="manual_login_password")
-                login_submit = st.form_submit_button("Login")
-
-                if login_submit:
-                    manual_username_lower = manual_username.lower()
-                    if manual_username_lower in credentials["usernames"]:
-                        stored_hash = credentials["usernames"][manual_username_lower]["password"].encode('utf-8')
-                        if bcrypt.checkpw(manual_password.encode('utf-8'), stored_hash):
-                            st.session_state["username"] = manual_username_lower
-                            st.session_state["name"] = credentials["usernames"][manual_username_lower]["name"]
-                            st.session_state["logged_in"] = True
-                            st.success(f"Welcome {st.session_state['name']}!")
-                            return True, manual_username_lower, st.session_state['name']
-                        else:
-                            st.error("Username/password incorrect")
-                    else:
-                        st.error("Username not found")
-                    return False, None, None
+        if not check_login(username_lower, login_password, user["password"]):
+            st.error("Username/password incorrect")
             return False, None, None
+    except PasswordServiceBusyError as e:
+        st.warning(str(e))
+        return False, None, None
     except Exception as e:
         st.error(f"Login error: {e}")
         return False, None, None
 
+    st.session_state["username"] = username_lower
+    st.session_state["name"] = user["name"]
+    st.session_state["logged_in"] = True
+
+    # Remember-me cookie, so a new session for this browser skips the form. Signed
+    # over the stored hash, which check_login may just have replaced with a rehash
+    try:
+        remember_session(username_lower, get_user_credentials(username_lower) or user)
+    except Exception as e:
+        # The password was right, so only staying logged in across sessions is lost
+        st.warning(f"Could not set the remember-me cookie: {e}")
+
+    st.success(f"Welcome {user['name']}!")
+    return True, username_lower, user["name"]
+
 def logout():
     try:
-        if "authenticator" in st.session_state:
-            st.session_state["authenticator"].logout("Logout", "sidebar", key="logout_button")
-        st.session_state["logged_in"] = False
-        st.session_state["username"] = None
-        st.session_state["name"] = None
-        if "authenticator" in st.session_state:
-            del st.session_state["authenticator"]
+        end_session()
         st.success("Logged out successfully!")
         # Instead of rerun, set page to Login
         st.session_state["page"] = "Login"
@@ -186,6 +166,9 @@ if "logged_in" not in st.session_state:
 if "page" not in st.session_state:
     st.session_state["page"] = "Login"  # Default to Login page
 
+# A valid remember-me cookie logs the session in (checked once per session)
+restore_session()
+
 # Sidebar navigation
 if not st.session_state["logged_in"]:
     st.sidebar.title("Navigation")
@@ -197,45 +180,41 @@ else:
     st.sidebar.title("Navigation")
     st.session_state["page"] = st.sidebar.radio(
         "Select a page",
-        ["Home", "Ask Queries", "Diagnosis", "Result", "Knowledge Center", "Logout"],
+        [*PAGES, "Logout"],
         key="nav_main"
     )
 
-# Page rendering
-if st.session_state["page"] == "Sign Up":
-    signup_page()
-elif st.session_state["page"] == "Login":
-    if not st.session_state["logged_in"]:
-        logged_in, username, name = login_page()
-        if logged_in:
-            st.session_state["logged_in"] = True
-            st.session_state["username"] = username
-            st.session_state["name"] = name
-            st.session_state["page"] = "Home"  # Redirect to Home after login
-elif st.session_state["page"] == "Logout":
-    logout()
-else:
-    if not st.session_state["logged_in"]:
-        st.warning("Please login or sign up first!")
-        st.session_state["page"] = "Login"
+# Page rendering, timed per page (a no-op unless telemetry is enabled)
+with telemetry.span("page", page=st.session_state["page"]):
+    if st.session_state["page"] == "Sign Up":
+        signup_page()
+    elif st.session_state["page"] == "Login":
+        if not st.session_state["logged_in"]:
+            logged_in, username, name = login_page()
+            if logged_in:
+                st.session_state["logged_in"] = True
+                st.session_state["username"] = username
+                st.session_state["name"] = name
+                st.session_state["page"] = "Home"  # Redirect to Home after login
+    elif st.session_state["page"] == "Logout":
+        logout()
     else:
-        Tabs = {
-            "Home": home,
-            "Ask Queries": talk2doc,
-            "Diagnosis": diagnosis,
-            "Result": result,
-            "Knowledge Center": kc
-        }
+        if not st.session_state["logged_in"]:
+            st.warning("Please login or sign up first!")
+            st.session_state["page"] = "Login"
+        else:
+            st.sidebar.info("Made with Yash Upadhyay")
 
-        st.sidebar.info("Made with Yash Upadhyay")
+            # Connection pool numbers for sizing replicas, enabled from secrets.toml
+            if st.secrets["mongodb"].get("show_pool_stats", False):
+                with st.sidebar.expander("MongoDB pool"):
+                    st.json(db.pool_stats())
 
-        try:
-            df, X, y = load_data()
-        except Exception as e:
-            st.error(f"Error loading data: {e}")
-            st.stop()
+            page = load_page(st.session_state["page"])
+            try:
+                data = resolve_dependencies(page)
+            except Exception as e:
+                st.error(f"Error loading data: {e}")
+                st.stop()
 
-        if st.session_state["page"] == "Diagnosis":
-            Tabs[st.session_state["page"]].app(df, X, y)
-        else:
-            Tabs[st.session_state["page"]].app()
\ No newline at end of file
+            page.app(**data)
\ No newline at end of file
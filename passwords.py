@@ -0,0 +1,159 @@
+"""Password hashing and verification off the Streamlit script thread.
+
+bcrypt is slow on purpose (about 250 ms at cost 12), so every hash and check
+runs on a small shared thread pool: a burst of logins queues for a worker
+instead of oversubscribing the CPU, and at most `per_user` checks for one
+username run at once, so hammering one account can't take all the workers.
+
+The cost factor is configurable. A successful login with a hash of another
+cost is rehashed at the current one and stored, so changing `rounds` moves
+users over as they log in. Override any setting in secrets.toml:
+
+    [passwords]
+    rounds = 12
+    workers = 4
+    per_user = 1
+    max_wait = 10
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import bcrypt
+import streamlit as st
+
+import db
+import telemetry
+from auth import invalidate_user
+
+PASSWORD_DEFAULTS = {
+    "rounds": 12,        # bcrypt cost factor for new hashes
+    "workers": 4,        # hashes/checks running at once in this process
+    "per_user": 1,       # checks running at once for one username
+    "max_wait": 10.0,    # seconds a call may wait for its user slot or a worker
+}
+
+
+class PasswordServiceBusyError(RuntimeError):
+    """Too many password checks queued (for this user or overall)."""
+
+
+def hash_rounds(hashed):
+    """Cost factor of a bcrypt hash ("$2b$12$..." -> 12), or None if it isn't one."""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordService:
+    def __init__(self, rounds=12, workers=4, per_user=1, max_wait=10.0):
+        self.rounds = rounds
+        self.per_user = per_user
+        self.max_wait = max_wait
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="passwords")
+        # username -> [semaphore, sessions using it]; entries go away when unused
+        self._user_slots = {}
+        self._lock = threading.Lock()
+
+    def _run(self, fn, *args):
+        future = self._pool.submit(fn, *args)
+        try:
+            return future.result(timeout=self.max_wait)
+        except FutureTimeoutError:
+            # Still queued: give up on it. Already running: let it finish unobserved
+            future.cancel()
+            raise PasswordServiceBusyError("Too many logins at once, please try again shortly.")
+
+    def _acquire_user(self, username):
+        with self._lock:
+            slot = self._user_slots.setdefault(username, [threading.BoundedSemaphore(self.per_user), 0])
+            slot[1] += 1
+        if slot[0].acquire(timeout=self.max_wait):
+            return slot
+        self._release_user(username, slot, acquired=False)
+        raise PasswordServiceBusyError("Too many login attempts for this user, please try again shortly.")
+
+    def _release_user(self, username, slot, acquired=True):
+        if acquired:
+            slot[0].release()
+        with self._lock:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self._user_slots[username]
+
+    @telemetry.timed("password", op="hash")
+    def hash(self, password):
+        """bcrypt hash of `password` at the configured cost, as a str."""
+        hashed = self._run(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+        return hashed.decode("utf-8")
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    @telemetry.timed("password", op="verify")
+    def verify(self, username, password, hashed):
+        """Check `password` against `hashed`. Returns (ok, new_hash).
+
+        new_hash is a hash of the password at the configured cost when the
+        check succeeded and `hashed` used another cost, else None (also when
+        the pool is too busy to rehash).
+        """
+        slot = self._acquire_user(username)
+        try:
+            ok = self._run(bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+            if not ok or not self.needs_rehash(hashed):
+                return ok, None
+            try:
+                return ok, self.hash(password)
+            except PasswordServiceBusyError:
+                # The password was right; the rehash can wait for a quieter login
+                return ok, None
+        finally:
+            self._release_user(username, slot)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def _password_secrets():
+    try:
+        return st.secrets.get("passwords", {})
+    except FileNotFoundError:
+        return {}
+
+
+def _service_settings():
+    settings = dict(PASSWORD_DEFAULTS)
+    password_secrets = _password_secrets()
+    for name, default in PASSWORD_DEFAULTS.items():
+        if name in password_secrets:
+            settings[name] = type(default)(password_secrets[name])
+    return settings
+
+
+def get_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PasswordService(**_service_settings())
+    return _service
+
+
+def hash_password(password):
+    return get_service().hash(password)
+
+
+def check_login(username, password, hashed):
+    """Verify a login and, if it succeeds on an outdated cost, store the rehashed password."""
+    ok, new_hash = get_service().verify(username, password, hashed)
+    if new_hash is not None:
+        try:
+            db.users().update_password(username, new_hash)
+            invalidate_user(username)
+        except Exception as e:
+            # The login is still good; the rehash is retried next time
+            print(f"Could not store rehashed password for {username}: {e}")
+    return ok
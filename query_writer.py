@@ -0,0 +1,209 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+
+@contextmanager
+def _file_lock(path, blocking=True):
+    """Exclusive lock on `path` shared by every process (and thread) that opens it.
+
+    Yields False instead of waiting when `blocking` is False and the lock is held.
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class QueryWriter:
+    """Write-behind queue for chatbot query audit records.
+
+    The request path only puts a tuple on a bounded queue. A background thread
+    encrypts the records and writes them with insert_many once `batch_size`
+    records are waiting or `flush_interval` seconds have passed. Records that
+    can't reach MongoDB (queue full, insert failed) are appended, already
+    encrypted, to a size-capped JSON-lines spill file and replayed after the
+    next successful flush. Several processes (replicas) can share one spill
+    file: appends and replays are serialized with file locks, and only one
+    process replays at a time. Lines that can't be decoded (e.g. cut short by a
+    crash) are skipped and counted as `corrupt`.
+    """
+
+    def __init__(self, insert_many, encrypt, max_queue=10_000, batch_size=100,
+                 flush_interval=1.0, spill_path="query_spill.jsonl",
+                 max_spill_bytes=50 * 1024 * 1024):
+        self.insert_many = insert_many
+        self.encrypt = encrypt
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.max_spill_bytes = max_spill_bytes
+
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.corrupt = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="query-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, username, query):
+        record = (username, datetime.utcnow(), query)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # MongoDB is falling behind; keep the record without blocking on the queue
+            self._spill([self._to_doc(record)])
+
+    def close(self, timeout=10.0):
+        """Stop the writer, flushing everything still queued."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "corrupt": self.corrupt,
+        }
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self._flush(batch)
+                except Exception as e:
+                    # Keep the writer alive for the records still to come
+                    print(f"Query writer: flush failed: {e}")
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            if self._stop.is_set():
+                # Shutting down: drain without waiting for the interval
+                deadline = 0
+        return batch
+
+    def _to_doc(self, record):
+        username, timestamp, query = record
+        return {"user": username, "timestamp": timestamp, "query": self.encrypt(query.encode())}
+
+    def _flush(self, batch):
+        docs = [self._to_doc(record) for record in batch]
+        try:
+            self.insert_many(docs)
+        except Exception as e:
+            print(f"Query writer: insert failed, spilling {len(docs)} records: {e}")
+            self._spill(docs)
+            return
+        self.written += len(docs)
+        self._replay_spill()
+
+    def _spill(self, docs):
+        lines = "".join(
+            json.dumps({
+                "user": doc["user"],
+                "timestamp": doc["timestamp"].isoformat(),
+                "query": doc["query"].decode(),
+            }) + "\n"
+            for doc in docs
+        )
+        with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+            size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+            if size + len(lines) > self.max_spill_bytes:
+                self.dropped += len(docs)
+                print(f"Query writer: spill file full, dropped {len(docs)} records")
+                return
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            self.spilled += len(docs)
+
+    def _read_spill(self, path):
+        docs, lines = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    doc = json.loads(line)
+                    doc = {"user": doc["user"], "timestamp": datetime.fromisoformat(doc["timestamp"]),
+                           "query": doc["query"].encode()}
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    self.corrupt += 1
+                    continue
+                docs.append(doc)
+                lines.append(line if line.endswith("\n") else line + "\n")
+        return docs, "".join(lines)
+
+    def _replay_spill(self):
+        # Only one writer (thread or process) replays at a time; the others skip
+        with _file_lock(self.spill_path + ".replay.lock", blocking=False) as acquired:
+            if acquired:
+                self._replay_locked()
+
+    def _replay_locked(self):
+        # The spill file is moved aside under the spill locks, so enqueue() can
+        # keep spilling while the batch is inserted
+        replay_path = self.spill_path + ".replaying"
+        with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+            # A leftover .replaying file (crash mid-replay) goes first; new spills wait their turn
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+
+        docs, lines = self._read_spill(replay_path)
+        try:
+            if docs:
+                self.insert_many(docs)
+        except Exception as e:
+            print(f"Query writer: replaying spill file failed, will retry: {e}")
+            # Put the records back in front of anything spilled meanwhile
+            with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+                if os.path.exists(self.spill_path):
+                    with open(self.spill_path, encoding="utf-8") as f:
+                        lines += f.read()
+                with open(self.spill_path, "w", encoding="utf-8") as f:
+                    f.write(lines)
+                os.remove(replay_path)
+            return
+        os.remove(replay_path)
+        self.replayed += len(docs)
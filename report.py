@@ -0,0 +1,97 @@
+"""PDF test reports for the Diagnosis page.
+
+build_report() renders the whole report in one pass into memory and keeps the
+result in a small LRU keyed on everything that appears on the page, so asking
+for the same report again (a rerun, a second download) costs a dict lookup.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import telemetry
+
+# Bump when the layout below changes so cached reports aren't served in the old format
+TEMPLATE_VERSION = 1
+
+REPORT_CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def report_key(user_name, measurements, prediction_result=None, model_accuracy=None):
+    """Hash of the report's inputs, prediction and template version."""
+    payload = json.dumps(
+        [TEMPLATE_VERSION, user_name, [[label, value] for label, value in measurements],
+         prediction_result, model_accuracy],
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@telemetry.timed("report", op="render")
+def render_report(user_name, measurements, prediction_result=None, model_accuracy=None):
+    """Return the report as PDF bytes. `measurements` is a list of (label, value) pairs."""
+    from fpdf import FPDF  # only loaded once a report is requested
+
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Add title
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(200, 10, txt="Diabetes Risk Assessment Report", ln=True, align='C')
+    pdf.ln(10)
+
+    # Add user name and timestamp
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"User Name: {user_name}", ln=True)
+    pdf.cell(200, 10, txt=f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
+    pdf.ln(10)
+
+    if prediction_result:
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(200, 10, txt="Prediction Result:", ln=True)
+        pdf.set_font("Arial", size=12)
+        pdf.cell(200, 10, txt=prediction_result, ln=True)
+        pdf.ln(5)
+
+    if model_accuracy:
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(200, 10, txt="Model Accuracy:", ln=True)
+        pdf.set_font("Arial", size=12)
+        pdf.cell(200, 10, txt=model_accuracy, ln=True)
+        pdf.ln(10)
+
+    # Add the measurements table
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(200, 10, txt="Measurements:", ln=True)
+    pdf.set_font("Arial", size=12)
+    for label, value in measurements:
+        pdf.cell(100, 10, txt=f"{label}:", ln=False)
+        pdf.cell(100, 10, txt=str(value), ln=True)
+
+    # fpdf returns a latin-1 str, fpdf2 a bytearray
+    output = pdf.output(dest="S")
+    if isinstance(output, str):
+        output = output.encode("latin-1")
+    return bytes(output)
+
+
+@telemetry.timed("report", op="build")
+def build_report(user_name, measurements, prediction_result=None, model_accuracy=None):
+    """Memoized render_report()."""
+    key = report_key(user_name, measurements, prediction_result, model_accuracy)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    pdf_bytes = render_report(user_name, measurements, prediction_result, model_accuracy)
+    with _lock:
+        _cache[key] = pdf_bytes
+        _cache.move_to_end(key)
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return pdf_bytes
@@ -0,0 +1,137 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    # "What is HbA1c?" and "  what is  hba1c " should share an entry
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + sqlite) cache of chatbot answers.
+
+    Entries are keyed on the normalized query and the prompt template version,
+    so changing the prompt never serves answers generated for the old one.
+    The sqlite tier survives restarts and is shared by every process on the
+    host; entries expire after `ttl` seconds and the least recently used rows
+    are evicted once it holds more than `max_rows`.
+    """
+
+    def __init__(self, path="capsule_cache.sqlite3", memory_size=512,
+                 ttl=7 * 24 * 3600, max_rows=20_000):
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.max_rows = max_rows
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Model time for the answers stored after a miss, to price a hit
+        self.miss_seconds = 0.0
+        self._timed_misses = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(query, version):
+        return hashlib.sha256(f"{version}\0{normalize_query(query)}".encode()).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, response = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, row[1], row[0])
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._puts += 1
+            # Counting rows is a table scan in sqlite, so only evict every so often
+            if self._puts % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def lookup(self, query, version):
+        response = self.get(self.make_key(query, version))
+        if response is None:
+            with self._lock:
+                self.misses += 1
+        return response
+
+    def store(self, query, version, response, elapsed):
+        """Cache a freshly generated answer; `elapsed` is what the model call took."""
+        with self._lock:
+            self._timed_misses += 1
+            self.miss_seconds += elapsed
+        self.put(self.make_key(query, version), response)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            avg_miss = self.miss_seconds / self._timed_misses if self._timed_misses else 0.0
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "avg_miss_seconds": avg_miss,
+                # Every hit is one model call (and its latency) we didn't pay for
+                "estimated_seconds_saved": hits * avg_miss,
+                "api_calls_saved": hits,
+            }
+
+    def _remember(self, key, created_at, response):
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
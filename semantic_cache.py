@@ -0,0 +1,214 @@
+import functools
+import re
+import threading
+
+import numpy as np
+
+# scipy and sklearn are imported where they're used, so importing this module
+# (and rendering Ask Queries) doesn't load them before the first lookup
+
+_WORD = re.compile(r"[a-z0-9]+")
+_NOT_CONTRACTION = re.compile(r"n['\u2019]t\b")
+
+# Words that flip or shift what a question asks ("before"/"after" meals, glucose
+# "above"/"below" 200, "should I not..."). Many are sklearn stop words; here they
+# stay in the vectors, and a cached answer is only served when both queries
+# contain exactly the same set of them. Negations all map to "not".
+_NEGATIONS = {"not", "no", "nor", "never", "none", "nothing", "without", "cannot", "cant", "dont",
+              "doesnt", "isnt", "arent", "shouldnt", "wont", "avoid", "stop", "skip"}
+GUARD_WORDS = _NEGATIONS | {
+    # direction and timing
+    "before", "after", "during", "above", "below", "over", "under", "up", "down",
+    "high", "higher", "low", "lower", "increase", "increases", "decrease", "decreases",
+    "raise", "raises", "reduce", "reduces",
+    # comparison and amount
+    "more", "less", "most", "least", "fewer", "too", "better", "worse", "best", "worst",
+    # harm
+    "bad", "unsafe", "harmful", "dangerous",
+}
+
+# Generic question words ("can I eat...", "is it ok to take...") count half, so
+# questions about the same things match however they are phrased
+LIGHT_WORDS = {"eat", "eating", "eats", "ok", "okay", "fine", "safe", "good", "allowed",
+               "take", "taking", "use", "using", "have", "having", "get", "help", "need"}
+LIGHT_WEIGHT = 0.5
+
+
+@functools.cache
+def _filler_words():
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    # "ca"/"wo" are left over from "can't"/"won't" once "n't" becomes "not"
+    return ENGLISH_STOP_WORDS | {"ca", "wo"}
+
+
+def _tokenize(text):
+    """Return (weighted tokens, guard words) of a query.
+
+    Filler words are dropped and the rest cut to a 5 letter prefix, a crude
+    stemmer that maps "diabetic"/"diabetes" and "banana"/"bananas" to the same
+    feature. Guard words are kept whole.
+    """
+    tokens, guards = [], set()
+    filler = _filler_words()
+    for word in _WORD.findall(_NOT_CONTRACTION.sub(" not", text.lower())):
+        if word in GUARD_WORDS:
+            word = "not" if word in _NEGATIONS else word
+            guards.add(word)
+            tokens.append((word, 1.0))
+        elif word not in filler:
+            tokens.append((word[:5], LIGHT_WEIGHT if word in LIGHT_WORDS else 1.0))
+    return tokens, frozenset(guards)
+
+
+class SemanticCache:
+    """Serve a stored answer for queries that are near-duplicates of earlier ones.
+
+    Queries are turned into unit-length term vectors with the hashing trick
+    (the same feature indices as sklearn's HashingVectorizer with
+    alternate_sign=False, without its per-call validation overhead). A stored
+    answer is returned when its query's cosine similarity to the new one is at
+    least `threshold` and both contain the same GUARD_WORDS, so "insulin before
+    meals" never gets the answer cached for "insulin after meals".
+
+    Cached vectors live in a column-major (CSC) matrix, which doubles as an
+    inverted index: a lookup only reads the rows sharing a term with the query.
+    New entries sit in a small pending list that is merged into the matrix in
+    batches. Lexical similarity can't always tell "metformin side effects" from
+    "insulin side effects", so keep the threshold high for medical answers.
+    """
+
+    def __init__(self, threshold=0.8, max_entries=100_000, n_features=2 ** 20, merge_every=64):
+        import scipy.sparse as sp
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.n_features = n_features
+        self.merge_every = merge_every
+
+        self._lock = threading.Lock()
+        self._rows = sp.csr_matrix((0, n_features), dtype=np.float32)
+        self._index = self._rows.tocsc()
+        self._pending = []
+        self._answers = []
+        # Guard word set of each entry, as small ints: merged rows, then pending ones
+        self._signatures = {}
+        self._row_guards = np.zeros(0, dtype=np.int32)
+        self._pending_guards = []
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._answers)
+
+    def vectorize(self, query):
+        """Return (feature indices, l2-normalized weights, guard words), or None for an empty query."""
+        from sklearn.utils import murmurhash3_32
+
+        tokens, guards = _tokenize(query)
+        counts = {}
+        for token, weight in tokens:
+            feature = abs(murmurhash3_32(token, seed=0)) % self.n_features
+            counts[feature] = counts.get(feature, 0) + weight
+        if not counts:
+            return None
+        indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return indices, weights / np.linalg.norm(weights), guards
+
+    def _signature(self, guards):
+        # Called with the lock held
+        return self._signatures.setdefault(guards, len(self._signatures))
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        import scipy.sparse as sp
+
+        indptr = np.cumsum([0] + [len(indices) for indices, _ in self._pending])
+        block = sp.csr_matrix(
+            (np.concatenate([w for _, w in self._pending]),
+             np.concatenate([i for i, _ in self._pending]),
+             indptr),
+            shape=(len(self._pending), self.n_features),
+        )
+        self._rows = sp.vstack([self._rows, block], format="csr")
+        self._index = self._rows.tocsc()
+        self._row_guards = np.concatenate([self._row_guards, np.array(self._pending_guards, dtype=np.int32)])
+        self._pending = []
+        self._pending_guards = []
+
+    def _scores(self, vector):
+        indices, weights, guards = vector
+        indptr, rows, data = self._index.indptr, self._index.indices, self._index.data
+
+        # Walk the posting list of each query term and sum the products per row
+        hit_rows = [rows[indptr[f]:indptr[f + 1]] for f in indices]
+        hit_weights = [data[indptr[f]:indptr[f + 1]] * w for f, w in zip(indices, weights)]
+        scores = np.bincount(
+            np.concatenate(hit_rows), np.concatenate(hit_weights), minlength=self._rows.shape[0]
+        )
+
+        if self._pending:
+            query = dict(zip(indices.tolist(), weights.tolist()))
+            pending = [
+                sum(query.get(f, 0.0) * w for f, w in zip(p_indices.tolist(), p_weights.tolist()))
+                for p_indices, p_weights in self._pending
+            ]
+            scores = np.concatenate([scores, pending])
+
+        # Entries whose guard words differ can't match at any similarity
+        signature = self._signatures.get(guards)
+        if signature is None:
+            return np.zeros_like(scores)
+        row_guards = np.concatenate([self._row_guards, np.array(self._pending_guards, dtype=np.int32)])
+        return np.where(row_guards == signature, scores, 0.0)
+
+    def lookup(self, query):
+        """Return (answer, similarity) of the closest cached query, or (None, similarity)."""
+        vector = self.vectorize(query)
+        with self._lock:
+            if vector is None or not self._answers:
+                self.misses += 1
+                return None, 0.0
+            scores = self._scores(vector)
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score >= self.threshold:
+                self.hits += 1
+                return self._answers[best], score
+            self.misses += 1
+            return None, score
+
+    def add(self, query, answer):
+        vector = self.vectorize(query)
+        if vector is None:
+            return
+        indices, weights, guards = vector
+        with self._lock:
+            self._pending.append((indices, weights))
+            self._pending_guards.append(self._signature(guards))
+            self._answers.append(answer)
+            if len(self._pending) >= self.merge_every:
+                self._merge_pending()
+            if len(self._answers) > self.max_entries:
+                # Drop the oldest tenth in one go so the index isn't rebuilt on every add
+                self._evict_oldest(len(self._answers) - self.max_entries + self.max_entries // 10)
+
+    def _evict_oldest(self, count):
+        self._merge_pending()
+        self._rows = self._rows[count:]
+        self._index = self._rows.tocsc()
+        self._row_guards = self._row_guards[count:]
+        del self._answers[:count]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._answers),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "threshold": self.threshold,
+            }
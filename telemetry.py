@@ -0,0 +1,284 @@
+"""Timing spans and latency histograms for page renders, DB, LLM, model and report calls.
+
+    with telemetry.span("page", page="Home"):
+        ...
+
+    @telemetry.timed("db", op="users.find_by_username")
+    def find_by_username(...): ...
+
+Every span name/label combination gets a histogram. Histograms are exported
+as Prometheus text or JSON to a file every `interval` seconds (and at exit),
+and/or served over HTTP at /metrics. Configure it in secrets.toml:
+
+    [telemetry]
+    enabled = true
+    format = "prometheus"   # or "json"
+    path = "metrics.prom"   # "" to skip the file
+    interval = 15           # seconds between file writes
+    port = 9464             # optional HTTP endpoint
+
+or TELEMETRY_ENABLED=1 in the environment (TELEMETRY_ENABLED=0 turns it off
+without reading secrets). When disabled, span() returns a shared no-op context
+manager and timed() adds one flag check per call.
+"""
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_NAME = "dhcp_span_seconds"
+
+# Upper bounds (seconds) of the histogram buckets, from cache hits to slow LLM answers
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+TELEMETRY_DEFAULTS = {
+    "enabled": False,
+    "format": "prometheus",
+    "path": "metrics.prom",
+    "interval": 15.0,
+    "port": 0,
+}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*BUCKETS, float("inf")), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """Histograms keyed on (span name, sorted labels)."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def _items(self):
+        with self._lock:
+            return [(name, labels, list(h.cumulative()), h.count, h.sum)
+                    for (name, labels), h in sorted(self._histograms.items())]
+
+    def to_prometheus(self):
+        lines = [f"# HELP {METRIC_NAME} Time spent in instrumented app code.", f"# TYPE {METRIC_NAME} histogram"]
+        for name, labels, buckets, count, total in self._items():
+            base = ",".join([f'span="{name}"'] + [f'{key}="{_escape(value)}"' for key, value in labels])
+            for bound, cumulative in buckets:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{METRIC_NAME}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{METRIC_NAME}_sum{{{base}}} {total}")
+            lines.append(f"{METRIC_NAME}_count{{{base}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return json.dumps({
+            "generated_at": time.time(),
+            "spans": [
+                {
+                    "span": name,
+                    "labels": dict(labels),
+                    "count": count,
+                    "sum_seconds": total,
+                    "buckets": {("+Inf" if bound == float("inf") else str(bound)): cumulative
+                                for bound, cumulative in buckets},
+                }
+                for name, labels, buckets, count, total in self._items()
+            ],
+        }, indent=2)
+
+    def render(self, fmt):
+        return self.to_json() if fmt == "json" else self.to_prometheus()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.seconds = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        labels = self.labels
+        if exc_type is not None:
+            if _is_script_control(exc_type):
+                # st.rerun() abandons the render (the rerun is timed instead);
+                # st.stop() ends it on purpose, so it counts as a normal render
+                if exc_type.__name__ == "RerunException":
+                    return False
+            else:
+                # Failed calls are timed too, under their own label
+                labels = {**labels, "error": exc_type.__name__}
+        registry.observe(self.name, self.seconds, labels)
+        return False
+
+
+def _is_script_control(exc_type):
+    # Streamlit's StopException/RerunException, matched by name so this module
+    # doesn't import streamlit
+    return any(cls.__name__ == "ScriptControlException" for cls in exc_type.__mro__)
+
+
+_settings = None
+_settings_lock = threading.Lock()
+
+
+def _telemetry_secrets():
+    # Imported here so worker processes that only render reports don't load streamlit
+    import streamlit as st
+
+    try:
+        return st.secrets.get("telemetry", {})
+    except FileNotFoundError:
+        return {}
+
+
+def settings():
+    """Telemetry settings, read once per process."""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                loaded = dict(TELEMETRY_DEFAULTS)
+                env = os.environ.get("TELEMETRY_ENABLED", "")
+                if env.lower() not in ("0", "false"):
+                    telemetry_secrets = _telemetry_secrets()
+                    for name, default in TELEMETRY_DEFAULTS.items():
+                        if name in telemetry_secrets:
+                            loaded[name] = type(default)(telemetry_secrets[name])
+                    if env:
+                        loaded["enabled"] = True
+                if loaded["enabled"]:
+                    _start_exporters(loaded)
+                _settings = loaded
+    return _settings
+
+
+def enabled():
+    return (_settings or settings())["enabled"]
+
+
+def span(name, **labels):
+    """Context manager timing its block into the `name` histogram."""
+    if not enabled():
+        return _NOOP
+    return Span(name, labels)
+
+
+def timed(name, **labels):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            with Span(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe(name, seconds, **labels):
+    """Record a duration measured elsewhere (e.g. an LLM stream's time to first token)."""
+    if enabled():
+        registry.observe(name, seconds, labels)
+
+
+def export(path=None, fmt=None):
+    """Write the histograms to `path` atomically, in the configured format by default."""
+    if path is None or fmt is None:
+        config = settings()
+        path = path or config["path"]
+        fmt = fmt or config["format"]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(registry.render(fmt))
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/metrics.json"):
+            self.send_error(404)
+            return
+        fmt = "json" if self.path.startswith("/metrics.json") else "prometheus"
+        body = registry.render(fmt).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json" if fmt == "json" else "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_exporters(config):
+    if config["path"]:
+        def write_periodically():
+            while True:
+                time.sleep(config["interval"])
+                _safe_export(config)
+
+        threading.Thread(target=write_periodically, name="telemetry-export", daemon=True).start()
+        atexit.register(_safe_export, config)
+
+    if config["port"]:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", config["port"]), _MetricsHandler)
+        except OSError as e:
+            # Another replica on this host already serves the port
+            print(f"Telemetry endpoint not started on port {config['port']}: {e}")
+        else:
+            threading.Thread(target=server.serve_forever, name="telemetry-http", daemon=True).start()
+
+
+def _safe_export(config):
+    try:
+        export(config["path"], config["format"])
+    except OSError as e:
+        print(f"Could not write telemetry to {config['path']}: {e}")
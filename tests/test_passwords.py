@@ -0,0 +1,53 @@
+import threading
+import time
+
+import bcrypt
+
+from passwords import PasswordService, PasswordServiceBusyError, hash_rounds
+
+
+def test_rehashes_at_the_configured_cost():
+    service = PasswordService(rounds=5, workers=2)
+    hashed = bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()
+    ok, new_hash = service.verify("ann", "pw", hashed)
+    assert ok and hash_rounds(new_hash) == 5
+    assert bcrypt.checkpw(b"pw", new_hash.encode())
+    assert service.verify("ann", "pw", new_hash) == (True, None)
+    assert service.verify("ann", "wrong", hashed) == (False, None)
+
+
+def test_busy_pool_during_rehash_still_logs_in(monkeypatch):
+    service = PasswordService(rounds=5, workers=1, max_wait=0.2)
+    hashed = bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()
+
+    def busy(password):
+        raise PasswordServiceBusyError("busy")
+
+    monkeypatch.setattr(service, "hash", busy)
+    assert service.verify("ann", "pw", hashed) == (True, None)
+
+
+def test_per_user_limit(monkeypatch):
+    def slow_check(password, hashed):
+        time.sleep(0.3)
+        return True
+
+    monkeypatch.setattr(bcrypt, "checkpw", slow_check)
+    service = PasswordService(rounds=4, workers=4, per_user=1, max_wait=0.5)
+    hashed = bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()
+    results = []
+
+    def attempt():
+        try:
+            results.append(service.verify("ann", "pw", hashed)[0])
+        except PasswordServiceBusyError:
+            results.append("busy")
+
+    # One check at a time for "ann": two finish within max_wait, the rest give up
+    threads = [threading.Thread(target=attempt) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results, key=str) == [True, True, "busy", "busy"]
+    assert service._user_slots == {}
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+
+from query_writer import QueryWriter
+
+
+class Store:
+    def __init__(self, delay=0.0):
+        self.docs = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def insert_many(self, docs):
+        time.sleep(self.delay)
+        with self.lock:
+            self.docs.extend(docs)
+
+    def queries(self):
+        return sorted(doc["query"].decode() for doc in self.docs)
+
+
+def spill_line(query):
+    return json.dumps({"user": "ann", "timestamp": "2026-01-01T00:00:00", "query": query}) + "\n"
+
+
+def make_writer(store, spill_path):
+    return QueryWriter(store.insert_many, lambda data: data, flush_interval=0.05, spill_path=str(spill_path))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_corrupt_spill_lines_are_skipped(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    # A leftover replay file whose last line was cut short by a crash
+    (tmp_path / "spill.jsonl.replaying").write_text(spill_line("q0") + "not json\n" + spill_line("q1")[:20])
+    store = Store()
+    writer = make_writer(store, spill)
+
+    writer.enqueue("ann", "q2")
+    assert wait_for(lambda: store.queries() == ["q0", "q2"])
+    assert writer.stats()["corrupt"] == 2
+    assert not (tmp_path / "spill.jsonl.replaying").exists()
+
+    # The writer thread survived and keeps writing
+    writer.enqueue("ann", "q3")
+    assert wait_for(lambda: "q3" in store.queries())
+    writer.close()
+
+
+def test_flush_error_does_not_stop_the_writer(tmp_path):
+    store = Store()
+    writer = QueryWriter(store.insert_many, lambda data: data if data != b"boom" else 1 / 0,
+                         flush_interval=0.05, spill_path=str(tmp_path / "spill.jsonl"))
+    writer.enqueue("ann", "boom")
+    time.sleep(0.2)
+    writer.enqueue("ann", "after")
+    assert wait_for(lambda: store.queries() == ["after"])
+    writer.close()
+
+
+def test_writers_sharing_a_spill_file_replay_it_once(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    spill.write_text("".join(spill_line(f"spilled{i}") for i in range(50)))
+    # Two writers standing in for two replicas; the slow insert keeps the replays overlapping
+    store = Store(delay=0.3)
+    writers = [make_writer(store, spill) for _ in range(2)]
+    for i, writer in enumerate(writers):
+        writer.enqueue("ann", f"fresh{i}")
+
+    expected = sorted([f"spilled{i}" for i in range(50)] + ["fresh0", "fresh1"])
+    assert wait_for(lambda: len(store.docs) >= len(expected))
+    time.sleep(0.5)
+    for writer in writers:
+        writer.close()
+    assert store.queries() == expected
+    assert sum(writer.stats()["replayed"] for writer in writers) == 50
@@ -0,0 +1,23 @@
+from response_cache import ResponseCache
+
+
+def test_every_missed_lookup_counts():
+    cache = ResponseCache(path=":memory:")
+    # Two misses, only one of which ends with an answer worth storing
+    assert cache.lookup("What is HbA1c?", 1) is None
+    assert cache.lookup("What is HbA1c?", 1) is None
+    cache.store("What is HbA1c?", 1, "answer", elapsed=2.0)
+
+    assert cache.lookup("what is hba1c", 1) == "answer"
+    stats = cache.stats()
+    assert stats["misses"] == 2
+    assert stats["memory_hits"] == 1
+    assert stats["hit_rate"] == 1 / 3
+    # A hit is priced at the model time of stored answers, not spread over every miss
+    assert stats["avg_miss_seconds"] == 2.0
+
+
+def test_prompt_version_is_part_of_the_key():
+    cache = ResponseCache(path=":memory:")
+    cache.store("What is HbA1c?", 1, "old answer", elapsed=1.0)
+    assert cache.lookup("What is HbA1c?", 2) is None
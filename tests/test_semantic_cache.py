@@ -0,0 +1,52 @@
+import pytest
+
+from semantic_cache import SemanticCache
+
+# Pairs that share most words but ask opposite things
+OPPOSITE_PAIRS = [
+    ("Should I take insulin before meals?", "Should I take insulin after meals?"),
+    ("Should I take insulin before meals?", "Should I not take insulin before meals"),
+    ("Should I take insulin before meals?", "Shouldn't I take insulin before meals?"),
+    ("What if my glucose is above 200?", "What if my glucose is below 200?"),
+    ("Can diabetics eat bananas?", "Can diabetics not eat bananas?"),
+    ("Are bananas ok for diabetes?", "Are bananas bad for diabetes?"),
+    ("Does metformin increase blood sugar?", "Does metformin decrease blood sugar?"),
+    ("Should I eat more carbs with diabetes?", "Should I eat less carbs with diabetes?"),
+    ("Symptoms of high blood sugar", "Symptoms of low blood sugar"),
+    ("Can I exercise with diabetes?", "Can I exercise without diabetes?"),
+]
+
+PARAPHRASE_PAIRS = [
+    ("can diabetics eat bananas", "are bananas ok for diabetes"),
+    ("What are the symptoms of type 2 diabetes?", "symptoms of type 2 diabetes"),
+]
+
+
+def cache_with(query):
+    cache = SemanticCache(threshold=0.8)
+    cache.add(query, "cached answer")
+    return cache
+
+
+@pytest.mark.parametrize("cached, asked", OPPOSITE_PAIRS + [(b, a) for a, b in OPPOSITE_PAIRS])
+def test_opposite_questions_miss(cached, asked):
+    answer, _ = cache_with(cached).lookup(asked)
+    assert answer is None
+
+
+@pytest.mark.parametrize("cached, asked", PARAPHRASE_PAIRS + [(b, a) for a, b in PARAPHRASE_PAIRS])
+def test_paraphrases_hit(cached, asked):
+    answer, score = cache_with(cached).lookup(asked)
+    assert answer == "cached answer"
+    assert score >= 0.8
+
+
+def test_guards_survive_merge_and_eviction():
+    cache = SemanticCache(threshold=0.8, max_entries=100, merge_every=8)
+    for i in range(150):
+        cache.add(f"insulin before meals {i}", f"answer {i}")
+    assert len(cache) <= 100
+    assert cache.lookup("insulin before meals 149") == ("answer 149", pytest.approx(1.0))
+    assert cache.lookup("insulin after meals 149")[0] is None
+    # The oldest entries were evicted, so this is at best a near match on another number
+    assert cache.lookup("insulin before meals 3")[0] != "answer 3"
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from tree_engine import CompiledTree, LEAF, export_tree, save_tree
+
+
+def make_data(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.poisson(3, rows),                       # Pregnancies
+        rng.normal(120, 32, rows).round(),          # Glucose
+        rng.normal(70, 12, rows).round(),           # BloodPressure
+        rng.normal(20, 10, rows).round(),           # SkinThickness
+        rng.exponential(80, rows).round(),          # Insulin
+        rng.normal(32, 7, rows).round(1),           # BMI
+        rng.gamma(2, 0.25, rows).round(3),          # DiabetesPedigreeFunction
+        rng.integers(21, 82, rows),                 # Age
+        rng.normal(5.6, 1.0, rows).round(1),        # HbA1c_level
+    ]).astype(float)
+    y = np.zeros(rows, dtype=int)
+    y[(X[:, 8] >= 5.7) & (X[:, 8] < 6.5)] = 4
+    y[(X[:, 8] >= 6.5) & (X[:, 7] < 30)] = 1
+    y[(X[:, 8] >= 6.5) & (X[:, 7] >= 30)] = 2
+    y[(X[:, 1] > 150) & (X[:, 0] > 0) & (y == 0)] = 3
+    y[rng.random(rows) < 0.05] = 5
+    return X, y
+
+
+def on_thresholds(model, X, seed=1):
+    """Rows whose value for a split's feature is exactly that split's threshold (or one float32 step off)."""
+    rng = np.random.default_rng(seed)
+    tree = model.tree_
+    rows = []
+    for node in np.flatnonzero(tree.children_left != LEAF):
+        feature, threshold = tree.feature[node], tree.threshold[node]
+        for value in (threshold, np.float32(threshold),
+                      np.nextafter(np.float32(threshold), np.float32(-np.inf)),
+                      np.nextafter(np.float32(threshold), np.float32(np.inf))):
+            row = X[rng.integers(len(X))].copy()
+            row[feature] = value
+            rows.append(row)
+    return np.array(rows)
+
+
+@pytest.fixture(scope="module", params=[4, None], ids=["depth4", "unbounded"])
+def fitted(request):
+    X, y = make_data(5_000)
+    model = DecisionTreeClassifier(criterion='entropy', max_depth=request.param, random_state=42).fit(X, y)
+    random_rows, _ = make_data(2_000, seed=7)
+    return model, CompiledTree.from_model(model), np.vstack([random_rows, on_thresholds(model, X), with_nan(random_rows)])
+
+
+def with_nan(X, seed=2):
+    """Rows with one or more NaN features, as an unparseable uploaded value becomes."""
+    rng = np.random.default_rng(seed)
+    rows = X[:400].copy()
+    rows[np.arange(200), 8] = np.nan                      # HbA1c_level, the first split
+    rows[200:][rng.random((200, X.shape[1])) < 0.3] = np.nan
+    return rows
+
+
+def test_vectorized_matches_sklearn(fitted):
+    model, compiled, X = fitted
+    np.testing.assert_array_equal(compiled.apply(X), model.apply(X))
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+
+
+def test_single_row_matches_sklearn(fitted):
+    model, compiled, X = fitted
+    for row in X[::7]:
+        one = row.reshape(1, -1)
+        assert compiled.apply(one).tolist() == model.apply(one).tolist()
+        assert compiled.predict(one).tolist() == model.predict(one).tolist()
+        np.testing.assert_allclose(compiled.predict_proba(one), model.predict_proba(one), rtol=0, atol=1e-12)
+
+
+def test_nan_rows_are_scored(fitted):
+    model, compiled, X = fitted
+    nan_rows = X[np.isnan(X).any(axis=1)]
+    assert len(nan_rows) > 300
+    np.testing.assert_array_equal(compiled.predict(nan_rows), model.predict(nan_rows))
+    for row in nan_rows[::9]:
+        assert compiled.predict(row.reshape(1, -1)).tolist() == model.predict(row.reshape(1, -1)).tolist()
+
+
+def test_old_export_rejects_nan(fitted):
+    model, _, X = fitted
+    arrays = export_tree(model)
+    del arrays['missing_go_to_left']
+    old = CompiledTree(**arrays)
+    np.testing.assert_array_equal(old.predict(X[:10]), model.predict(X[:10]))
+    with pytest.raises(ValueError):
+        old.predict(np.full((1, X.shape[1]), np.nan))
+
+
+def test_saved_tree_loads_the_same(fitted, tmp_path):
+    model, compiled, X = fitted
+    path = tmp_path / "tree.npz"
+    save_tree(path, export_tree(model))
+    loaded = CompiledTree.load(path)
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
@@ -0,0 +1,87 @@
+"""Offline training entry point.
+
+    python train.py [--data diabetes.csv] [--out models]
+
+Fits the diagnosis model, then writes models/diabetes-tree-<version>.joblib
+(sklearn model + feature schema + metrics), the same metadata as .json, the
+tree flattened to NumPy arrays as .npz, and points models/LATEST at the new
+version. The app loads the .json/.npz pair once per process instead of
+training on cold start, and never imports sklearn.
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import joblib
+import sklearn
+
+from tree_engine import export_tree, save_tree
+from web_functions import DATA_PATH, FEATURE_COLUMNS, MODEL_DIR, artifact_path, read_dataset, train_model
+
+
+def dataset_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def build_artifact(data_path=DATA_PATH):
+    df, X, y = read_dataset(data_path)
+    model, score = train_model(X, y)
+
+    trained_at = datetime.now(timezone.utc)
+    digest = dataset_digest(data_path)
+    version = f"{trained_at:%Y%m%d%H%M%S}-{digest[:8]}"
+    return {
+        'model': model,
+        'version': version,
+        'feature_columns': list(FEATURE_COLUMNS),
+        'classes': model.classes_.tolist(),
+        'metrics': {
+            'score': score,
+            'rows': len(df),
+            'class_counts': {str(k): int(v) for k, v in y.value_counts().sort_index().items()},
+            'tree_depth': int(model.get_depth()),
+            'leaves': int(model.get_n_leaves()),
+        },
+        'trained_at': trained_at.isoformat(),
+        'dataset': {'path': data_path, 'sha256': digest},
+        'sklearn_version': sklearn.__version__,
+    }
+
+
+def save_artifact(artifact, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    version = artifact['version']
+    joblib.dump(artifact, artifact_path(version, model_dir))
+    # What the app loads: the tree as plain arrays, no sklearn needed
+    save_tree(artifact_path(version, model_dir, ext='npz'), export_tree(artifact['model']))
+
+    metadata = {key: value for key, value in artifact.items() if key != 'model'}
+    with open(artifact_path(version, model_dir, ext='json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    # Write the pointer last (atomically) so readers never see a half-written version
+    tmp = os.path.join(model_dir, 'LATEST.tmp')
+    with open(tmp, 'w') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(model_dir, 'LATEST'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the diagnosis model and save a versioned artifact.")
+    parser.add_argument('--data', default=DATA_PATH, help="training CSV")
+    parser.add_argument('--out', default=MODEL_DIR, help="artifact directory")
+    args = parser.parse_args()
+
+    artifact = build_artifact(args.data)
+    save_artifact(artifact, args.out)
+    print(f"Saved model {artifact['version']} to {args.out}/ (score {artifact['metrics']['score']:.4f})")
+
+
+if __name__ == '__main__':
+    main()
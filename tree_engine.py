@@ -0,0 +1,114 @@
+"""sklearn-free inference for the diagnosis decision tree.
+
+export_tree() flattens a fitted DecisionTreeClassifier into plain NumPy arrays
+that save_tree() stores as .npz; CompiledTree evaluates them with the same
+results as model.predict / model.predict_proba, without importing sklearn.
+"""
+import numpy as np
+
+LEAF = -1  # sklearn's TREE_LEAF marker in children_left / children_right
+
+
+def export_tree(model):
+    tree = model.tree_
+    value = tree.value[:, 0, :].astype(np.float64)
+
+    # predict_proba answers per node. sklearn >= 1.4 stores class fractions and
+    # returns them as they are; older versions store counts and normalize per
+    # call. Normalizing only rows that don't already sum to 1 reproduces both.
+    totals = value.sum(axis=1, keepdims=True)
+    proba = np.where(np.isclose(totals, 1.0), value, value / np.where(totals == 0.0, 1.0, totals))
+
+    return {
+        'feature': tree.feature.astype(np.int32),
+        'threshold': tree.threshold.astype(np.float64),
+        'left': tree.children_left.astype(np.int32),
+        'right': tree.children_right.astype(np.int32),
+        'value': value,
+        'proba': proba,
+        'classes': np.asarray(model.classes_),
+        'max_depth': np.int32(tree.max_depth),
+        # Where NaN goes at each split (sklearn >= 1.3): the side that held missing
+        # values in training, otherwise the child with more samples
+        'missing_go_to_left': np.asarray(tree.missing_go_to_left, dtype=bool),
+    }
+
+
+def save_tree(path, arrays):
+    np.savez(path, **arrays)
+
+
+class CompiledTree:
+    def __init__(self, feature, threshold, left, right, value, proba, classes, max_depth,
+                 missing_go_to_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.classes = classes
+        self.max_depth = int(max_depth)
+        # None for trees exported before it was stored: those can't score NaN
+        self.missing_go_to_left = missing_go_to_left
+
+        self.proba = proba
+        # predict() is the argmax of the raw node values, as in sklearn; precompute it per node
+        self.leaf_class = classes[np.argmax(value, axis=1)]
+
+        # Python lists for the single-row path: indexing them is far cheaper
+        # than NumPy scalar indexing when only one sample walks the tree
+        self._feature = feature.tolist()
+        self._threshold = threshold.tolist()
+        self._left = left.tolist()
+        self._right = right.tolist()
+        self._missing_left = missing_go_to_left.tolist() if missing_go_to_left is not None else None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(**export_tree(model))
+
+    def apply(self, X):
+        """Return the leaf index each row of X ends up in."""
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        X = np.asarray(X, dtype=np.float32)
+        missing = np.isnan(X)
+        if self.missing_go_to_left is None and missing.any():
+            raise ValueError("This model was exported without missing-value routing; retrain it to score NaN")
+        if X.shape[0] == 1:
+            return np.array([self._apply_one(X[0].tolist())], dtype=np.intp)
+
+        rows = np.arange(X.shape[0])
+        nodes = np.zeros(X.shape[0], dtype=np.intp)
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            internal = left != LEAF
+            if not internal.any():
+                break
+            values = X[rows, self.feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            if self.missing_go_to_left is not None:
+                go_left |= np.isnan(values) & self.missing_go_to_left[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+        return nodes
+
+    def _apply_one(self, row):
+        node = 0
+        left, right, feature, threshold = self._left, self._right, self._feature, self._threshold
+        missing_left = self._missing_left
+        while left[node] != LEAF:
+            value = row[feature[node]]
+            if value <= threshold[node] or (value != value and missing_left[node]):
+                node = left[node]
+            else:
+                node = right[node]
+        return node
+
+    def predict_proba(self, X):
+        return self.proba[self.apply(X)]
+
+    def predict(self, X):
+        return self.leaf_class[self.apply(X)]
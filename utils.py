@@ -1,28 +1,50 @@
-from pymongo import MongoClient
 from cryptography.fernet import Fernet
-from datetime import datetime
+import threading
 import streamlit as st
+import db
+from query_writer import QueryWriter
 
-# Setup MongoDB client and cipher - reuse your secrets from Streamlit
-client = MongoClient(st.secrets["mongodb"]["uri"])
-db = client["diabetes_app"]
-queries_col = db["user_data"]
+# Setup cipher - reuse your secrets from Streamlit
 
 key = st.secrets["encryption"]["key"].encode()
 cipher = Fernet(key)
 
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_query_writer():
+    # One background writer per process, shared by every session
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = QueryWriter(
+                    insert_many=lambda docs: db.user_data().insert_queries(docs),
+                    encrypt=cipher.encrypt
+                )
+    return _writer
+
 def store_user_query(username, query):
-    encrypted_query = cipher.encrypt(query.encode())
-    queries_col.insert_one({
-        "user": username,
-        "timestamp": datetime.utcnow(),
-        "query": encrypted_query
-    })
+    # Encryption and the insert happen on the writer thread, off the request path
+    get_query_writer().enqueue(username, query)
+
+def get_user_queries_page(username, cursor=None, page_size=20):
+    """Return (queries, next_cursor) for one newest-first page of a user's history.
+
+    Only the documents on this page are decrypted. Pass next_cursor back in to
+    get the following page; it is None once there are no older queries.
+    """
+    docs = db.user_data().find_page(username, before=cursor, limit=page_size + 1)
+    has_more = len(docs) > page_size
+    docs = docs[:page_size]
+    queries = [(doc["timestamp"], cipher.decrypt(doc["query"]).decode()) for doc in docs]
+    next_cursor = (docs[-1]["timestamp"], docs[-1]["_id"]) if has_more else None
+    return queries, next_cursor
+
+def iter_user_queries(username):
+    # Streams the whole history for exports, decrypting one document at a time
+    for doc in db.user_data().find_by_user(username):
+        yield doc["timestamp"], cipher.decrypt(doc["query"]).decode()
 
 def get_user_queries(username):
-    docs = queries_col.find({"user": username})
-    decrypted_queries = []
-    for doc in docs:
-        decrypted_query = cipher.decrypt(doc["query"]).decode()
-        decrypted_queries.append((doc["timestamp"], decrypted_query))
-    return decrypted_queries
+    return list(iter_user_queries(username))
@@ -1,22 +1,110 @@
+import json
+import os
+from collections.abc import Mapping
 import numpy as np
 import pandas as pd
-from sklearn.tree import DecisionTreeClassifier
 import streamlit as st
+from tree_engine import CompiledTree
+from data_browser import DataBrowser
+import telemetry
 
+# Column order the model is trained on; batch inputs are checked against it
+FEATURE_COLUMNS = ['HbA1c_level','Pregnancies','Glucose','BloodPressure','SkinThickness','Insulin','BMI','DiabetesPedigreeFunction','Age']
 
-@st.cache_data()
+DATA_PATH = 'diabetes.csv'
 
-def load_data():
-    df=pd.read_csv('diabetes.csv')
-    X = df[['HbA1c_level','Pregnancies','Glucose','BloodPressure','SkinThickness','Insulin','BMI','DiabetesPedigreeFunction','Age']]
+# Written by `python convert_data.py`: one memory-mappable .npy per column
+COLUMNAR_DIR = 'data/diabetes'
+
+# Written by `python train.py`; LATEST holds the version the app serves
+MODEL_DIR = 'models'
+
+
+def read_columnar(directory=COLUMNAR_DIR):
+    """Memory-map the per-column .npy files described by `directory`/schema.json.
+
+    The arrays are read-only views of the files, so every process serving the
+    app shares one copy of the data through the OS page cache.
+    """
+    with open(os.path.join(directory, 'schema.json')) as f:
+        schema = json.load(f)
+    columns = {
+        column['name']: np.load(os.path.join(directory, column['file']), mmap_mode='r')
+        for column in schema['columns']
+    }
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_dataset(path=None):
+    # A directory is the columnar format; a file is the CSV. Without a path,
+    # prefer the converted data and fall back to the CSV.
+    if path is None:
+        path = COLUMNAR_DIR if os.path.exists(os.path.join(COLUMNAR_DIR, 'schema.json')) else DATA_PATH
+    if os.path.isdir(path):
+        df = read_columnar(path)
+    else:
+        df=pd.read_csv(path)
+    X = df[FEATURE_COLUMNS]
     y = df['Outcome']
 
     return df, X, y
 
 
-@st.cache_data()
+@st.cache_resource
+
+# Timed inside the cache, so only actual loads are counted
+@telemetry.timed("data", op="load_data")
+def load_data():
+    # cache_resource hands every session the same (read-only) frames;
+    # cache_data would pickle and copy them on each call
+    return read_dataset()
+
+
+def _as_written(value):
+    # float32 columns (columnar data) give 2.4000000953674316 for 2.4; its
+    # shortest repr is the value as it was in the CSV
+    if isinstance(value, np.float32):
+        return float(str(value))
+    return float(value)
+
+
+class DatasetProfile:
+    """Per-column statistics of the dataset, computed once so pages don't rescan it."""
+
+    QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+    def __init__(self, df):
+        numeric = df.select_dtypes(include='number')
+        self.rows = len(df)
+        self.columns = list(df.columns)
+        self.dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+        self.min = {col: _as_written(numeric[col].min()) for col in numeric.columns}
+        self.max = {col: _as_written(numeric[col].max()) for col in numeric.columns}
+        self.quantiles = numeric.quantile(self.QUANTILES)
+        self.describe = df.describe()
+
+
+@st.cache_resource
+
+def load_profile():
+    # Built once per process next to load_data; reruns only read from it
+    df, X, y = load_data()
+    return DatasetProfile(df)
+
+
+@st.cache_resource
+
+def load_browser():
+    # Shared by all sessions so each column is sorted at most once per process
+    df, X, y = load_data()
+    return DataBrowser(df)
 
+
+@telemetry.timed("model", op="train")
 def train_model(X,y):
+    # Only training needs sklearn; the app predicts with the compiled tree
+    from sklearn.tree import DecisionTreeClassifier
+
     model = DecisionTreeClassifier(
         ccp_alpha=0.0, #Increases the amount of pruning, which reduces overfitting. 
         class_weight=None, #This parameter allows you to assign different weights to classes
@@ -38,15 +126,104 @@ def train_model(X,y):
 
     return model, score
 
-def predict(X, y, features):
+def artifact_path(version, model_dir=MODEL_DIR, ext='joblib'):
+    return os.path.join(model_dir, f'diabetes-tree-{version}.{ext}')
+
+
+def latest_version(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, 'LATEST')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_resource
+
+@telemetry.timed("model", op="load")
+def load_model():
+    """Load the latest trained model once per process.
+
+    Returns a dict with the compiled tree, its feature_columns, metrics and
+    version, read from the .npz/.json pair train.py writes, so sklearn is never
+    imported here. Without an artifact (train.py never run) the model is
+    trained from the dataset in-process, as the app used to do on every cold start.
+    """
+    version = latest_version()
+    if version is not None:
+        with open(artifact_path(version, ext='json')) as f:
+            metadata = json.load(f)
+        return {
+            'tree': CompiledTree.load(artifact_path(version, ext='npz')),
+            'feature_columns': metadata['feature_columns'],
+            'metrics': metadata['metrics'],
+            'version': version,
+        }
+
+    print(f"No model artifact in {MODEL_DIR}/, training from {DATA_PATH}. Run `python train.py` to avoid this.")
+    df, X, y = read_dataset()
     model, score = train_model(X, y)
-    
-    # Reshape the features correctly
-    features = np.array(features).reshape(1, -1)  # Reshape to (1, n_features)
-    
-    prediction = model.predict(features)
-    print(prediction)
-    
-    return prediction, score
+    return {
+        'tree': CompiledTree.from_model(model),
+        'feature_columns': list(FEATURE_COLUMNS),
+        'metrics': {'score': score},
+        'version': 'untracked',
+    }
+
+
+def _feature_matrix(data, feature_columns=FEATURE_COLUMNS):
+    # DataFrames and mappings are matched by name and put in the training
+    # order `feature_columns`; arrays must be in FEATURE_COLUMNS order
+    if isinstance(data, (pd.DataFrame, Mapping)):
+        names = data.columns if isinstance(data, pd.DataFrame) else data.keys()
+        missing = [col for col in feature_columns if col not in names]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+        if isinstance(data, pd.DataFrame):
+            return data[feature_columns].to_numpy(dtype=float)
+        return np.array([[data[col] for col in feature_columns]], dtype=float)
+
+    if sorted(feature_columns) != sorted(FEATURE_COLUMNS):
+        raise ValueError(
+            f"The model was trained on {', '.join(feature_columns)}; pass a DataFrame keyed by those names"
+        )
+    features = np.asarray(data, dtype=float)
+    if features.ndim != 2 or features.shape[1] != len(FEATURE_COLUMNS):
+        raise ValueError(
+            f"Expected a 2-D array with {len(FEATURE_COLUMNS)} columns ({', '.join(FEATURE_COLUMNS)}), "
+            f"got shape {features.shape}"
+        )
+    if list(feature_columns) != list(FEATURE_COLUMNS):
+        features = features[:, [FEATURE_COLUMNS.index(col) for col in feature_columns]]
+    return features
+
+@telemetry.timed("model", op="predict_batch")
+def predict_batch(data):
+    """Score N patients at once.
+
+    `data` is a DataFrame with the FEATURE_COLUMNS (any order, extra columns are
+    ignored), a mapping of feature name to value for one patient, or an (N, 9)
+    array in FEATURE_COLUMNS order. Returns
+    (labels, probabilities, score) where probabilities has one column per
+    class, in the order of the model's classes.
+    """
+    artifact = load_model()
+    tree, score = artifact['tree'], artifact['metrics']['score']
+    features = _feature_matrix(data, artifact['feature_columns'])
+
+    # One pass through the tree gives both answers
+    leaves = tree.apply(features)
+
+    return tree.leaf_class[leaves], tree.proba[leaves], score
 
+def predict(patient):
+    """Score one patient given as a mapping or one-row DataFrame keyed by feature name."""
+    if isinstance(patient, pd.DataFrame):
+        if len(patient) != 1:
+            raise ValueError(f"predict() scores one patient, got {len(patient)} rows; use predict_batch()")
+    elif not isinstance(patient, Mapping):
+        # A bare list has no names to check its order against
+        raise TypeError("predict() takes the patient as a mapping or DataFrame keyed by feature name")
+    labels, probabilities, score = predict_batch(patient)
 
+    return labels, score